@@ -1,14 +1,28 @@
+import copy
 import json
 import os
 
 # Store config in user's home directory
 CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".file_tree_config.json")
 
+# Last parsed configuration, keyed by the config file's (mtime_ns, size)
+CONFIG_CACHE = {}
+
+def config_file_key():
+    """Return the (mtime_ns, size) of the config file, or None if it does not exist"""
+    try:
+        st = os.stat(CONFIG_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
 def save_config(config_dict):
     """Save configuration to a JSON file"""
     try:
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config_dict, f, indent=4)
+        # The next load parses the file again, so it sees exactly what JSON round-trips
+        CONFIG_CACHE.clear()
         return True
     except Exception as e:
         print(f"Error saving configuration: {str(e)}")
@@ -37,9 +51,16 @@ def load_config():
     }
     
     try:
-        if os.path.exists(CONFIG_FILE):
+        key = config_file_key()
+        if key is not None:
+            # Unchanged file: skip the parse; copies keep callers from editing the cache
+            if key in CONFIG_CACHE:
+                return copy.deepcopy(CONFIG_CACHE[key])
             with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
+                config = json.load(f)
+            CONFIG_CACHE.clear()
+            CONFIG_CACHE[key] = copy.deepcopy(config)
+            return config
         return default_config
     except Exception as e:
         print(f"Error loading configuration: {str(e)}")
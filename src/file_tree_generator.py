@@ -3,13 +3,159 @@ import datetime
 import argparse
 import sys
 import re
+import functools
+import io
+import itertools
+import json
+import threading
 import token_estimator
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# orjson is optional; it makes JSON export much faster on large trees
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 import tkinter as tk
 from tkinter import ttk, messagebox
 
 from reference_tracking import ReferenceTrackingManager
 
+# Separator lines, built once rather than per section and per file
+SECTION_SEPARATOR = "=" * 80
+SUBSECTION_SEPARATOR = "-" * 80
+CONTENT_RULE = "─" * 70
+CONTENT_HEADER_TOP = "┌" + CONTENT_RULE
+CONTENT_HEADER_BOTTOM = "├" + CONTENT_RULE
+CONTENT_FOOTER = "└" + CONTENT_RULE
+
+# Tree glyphs indexed by is_last: (item glyph, glyph continuing below the item)
+TREE_GLYPHS = (("├── ", "│   "), ("└── ", "    "))
+ULTRA_COMPACT_TREE_GLYPHS = (("| ", "| "), ("L ", "  "))
+
+# Markers the exporters look for in the text output
+CONTENT_BAR = "│"
+CONTENT_END = "└─"
+DIRECTORY_SECTION_MARKER = "DIRECTORY STRUCTURE SUMMARY"
+DETAILED_SECTION_MARKER = "DETAILED FILE TREE WITH CONTENTS"
+REFERENCE_SECTION_MARKER = "REFERENCE TRACKING SUMMARY"
+SECTION_MARKERS = (DIRECTORY_SECTION_MARKER, DETAILED_SECTION_MARKER, REFERENCE_SECTION_MARKER)
+
+# Matches the folder/file icon that starts a tree line, after the tree prefix.
+# The prefix is four characters of indentation and branch glyphs per level, so
+# the icon's column divided by 4 is the item's depth.
+TREE_ITEM_PATTERN = re.compile(r'[\s│├└─]*(📁|📄)')
+TREE_LINE_PATTERN = re.compile(
+    r'(?P<indent>[\s│├└─]*)(?P<kind>📁|📄) (?P<name>.+?)'
+    r'(?: \((?P<info>[^()]*)\))?(?P<ref> \[REFERENCED\])?\s*$'
+)
+
+# Numbered content line: the text before the first pair of bars around a line
+# number (the tree prefix), the number, then the code
+NUMBERED_CONTENT_PATTERN = re.compile(r'(.*?)│\s*(\d+)\s*│(.*)', re.DOTALL)
+
+# Starts the header line of a file's content block; its column is where the
+# block's own frame begins, after the tree prefix
+CONTENT_HEADER_MARKER = CONTENT_BAR + " FILE CONTENT:"
+
+# Characters str.splitlines() breaks lines at
+LINE_BREAK_PATTERN = re.compile('[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]')
+
+# Comment syntax for each file extension remove_code_comments handles:
+# (line comment marker, block comment start, block comment end), None where a
+# language has no such comment
+C_STYLE_COMMENTS = ('//', '/*', '*/')
+HASH_COMMENTS = ('#', None, None)
+MARKUP_COMMENTS = (None, '<!--', '-->')
+BLOCK_COMMENTS = (None, '/*', '*/')
+SQL_COMMENTS = ('--', '/*', '*/')
+COMMENT_SYNTAX = {
+    # C-style languages (C, C++, C#, Java, JavaScript, etc.): /* */, // and ///
+    **dict.fromkeys(['.c', '.cpp', '.cs', '.h', '.hpp', '.java', '.js', '.ts', '.php', '.swift'],
+                    C_STYLE_COMMENTS),
+    # Python, Ruby, Bash, etc.: #
+    **dict.fromkeys(['.py', '.rb', '.sh', '.bash', '.yml', '.yaml'], HASH_COMMENTS),
+    # HTML/XML: <!-- -->
+    **dict.fromkeys(['.html', '.htm', '.xml', '.svg', '.jsp', '.aspx'], MARKUP_COMMENTS),
+    # CSS: /* */
+    **dict.fromkeys(['.css', '.scss', '.less'], BLOCK_COMMENTS),
+    # SQL: -- and /* */
+    '.sql': SQL_COMMENTS,
+}
+
+# Lines that open and close the HTML export around the converted output lines
+HTML_DOCUMENT_START = (
+    '<!DOCTYPE html>',
+    '<html>',
+    '<head>',
+    '    <title>File Tree</title>',
+    '    <style>',
+    '        body { font-family: monospace; background-color: #f5f5f5; padding: 20px; }',
+    '        .tree { white-space: pre; }',
+    '        .dir { color: #0066cc; font-weight: bold; }',
+    '        .file { color: #333; }',
+    '        .referenced { color: #008800; font-weight: bold; }',
+    '        .content { margin-left: 20px; border-left: 1px solid #ccc; padding-left: 10px; }',
+    '        .content-header { color: #666; }',
+    '        .line-number { color: #999; margin-right: 10px; }',
+    '        .code { color: #333; }',
+    '        .separator { color: #999; }',
+    '    </style>',
+    '</head>',
+    '<body>',
+    '    <div class="tree">',
+)
+HTML_DOCUMENT_END = ('    </div>', '</body>', '</html>')
+
+# Escapes HTML special characters in a single str.translate pass
+HTML_ESCAPE_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+# Lines smart_truncate_line shortens around their parentheses or from the end
+DECLARATION_LINE_PATTERN = re.compile(
+    r'\s*(public|private|protected|internal|static|void|function|def|class|interface|struct|enum)\s+\w+')
+IMPORT_LINE_PATTERN = re.compile(r'\s*(import|using|require|include|from)\s+')
+
+# Bytes is_binary_file counts as printable text: ASCII 32-126, tab, LF and CR
+PRINTABLE_BYTES = bytes(range(32, 127)) + b'\t\n\r'
+
+# Units used by format_size, each 1024 times the previous one
+SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
+
+# Line lengths at or above this are treated as "no limit"
+UNLIMITED_LINE_LENGTH = 10_000_000
+
+# Number of buffered output lines that triggers a write to the output file
+OUTPUT_FLUSH_LINES = 10000
+
+# Write buffer size for output files
+OUTPUT_BUFFER_SIZE = 1 << 20
+WRITE_BATCH_LINES = 4096
+READ_BUFFER_SIZE = 128 * 1024
+
+# Text files up to this many characters are read in one call and split at once
+WHOLE_READ_CHARS = 1 << 20
+
+# Output directories already created or checked by safe_write_file
+ENSURED_DIRECTORIES = set()
+
+# Worker threads used to scan sibling directories concurrently
+SCAN_WORKERS = 8
+
+# Worker threads reading file contents ahead of the detailed tree, and how many
+# files may be read ahead of the one being rendered
+READ_WORKERS = 8
+READ_AHEAD_FILES = 64
+
+# File contents kept by read_file_cached so a tree regenerated in the same
+# process, as the GUI does, skips files that did not change. The cache holds at
+# most FILE_CONTENT_CACHE_LINES lines in total.
+FILE_CONTENT_CACHE = {}
+FILE_CONTENT_CACHE_LINES = 200_000
+FILE_CONTENT_CACHE_LOCK = threading.Lock()
+cached_content_lines = 0
+
 def parse_args():
     """Parse command line arguments for file tree generator"""
     parser = argparse.ArgumentParser(
@@ -38,8 +184,8 @@ def parse_args():
                         help="Maximum length of each line to display")
     parser.add_argument("--compact", "-c", action="store_true",
                         help="Use compact view for cleaner output")
-    parser.add_argument("--format", "-f", choices=["txt", "html", "markdown", "json"], default="txt",
-                        help="Output format")
+    parser.add_argument("--format", "-f", default="txt",
+                        help="Output format (txt, html, markdown or json), or a comma-separated list of formats")
     parser.add_argument("--recursive", "-r", action="store_true",
                         help="Recursively process all subdirectories")
     parser.add_argument("--verbose", "-v", action="store_true",
@@ -69,7 +215,8 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
                   remove_comments=False, exclude_empty_lines=False,
                   smart_truncate=False, hide_binary_files=False, hide_repeated_sections=False,
                   priority_folders=None, priority_files=None, referenced_files=None,
-                  enable_token_estimation=False, token_model="claude-3.5-sonnet", token_method="char"):
+                  enable_token_estimation=False, token_model="claude-3.5-sonnet", token_method="char",
+                  output_format="txt"):
     """
     Generate a text-based visual representation of a directory tree and file contents.
     
@@ -94,183 +241,382 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
     enable_token_estimation (bool): Whether to include token estimates
     token_model (str): Model to use for token estimation
     token_method (str): Method for token estimation (char or word)
+    output_format (str): Format to write (txt, html, markdown or json), or a comma-separated
+                         list of formats written next to output_file with their own extensions
     """
+    # Check the requested formats before doing any work
+    output_formats, unknown_formats = parse_output_formats(output_format)
+    if unknown_formats:
+        return f"Error: Unknown output format: {', '.join(unknown_formats)}"
+    
     # Initialize lists and options
     blacklist_folders = set(blacklist_folders or [])
     blacklist_files = set(blacklist_files or [])
     priority_folders = priority_folders or []
     priority_files = priority_files or []
     
+    # str.endswith accepts a tuple, so the extension test is a single C-level call
+    ext_tuple = tuple(extensions)
+    
+    # Map priority names to their position once instead of list.index() per sort key
+    # (setdefault keeps the first position if a name is listed twice)
+    folder_priority = {}
+    for index, name in enumerate(priority_folders):
+        folder_priority.setdefault(name, index)
+    file_priority = {}
+    for index, name in enumerate(priority_files):
+        file_priority.setdefault(name, index)
+    default_folder_priority = len(priority_folders)
+    default_file_priority = len(priority_files)
+    
+    def folder_sort_key(entry):
+        """Sort key placing priority folders first, then by name"""
+        return (folder_priority.get(entry.name, default_folder_priority), entry.name)
+    
+    def file_sort_key(entry):
+        """Sort key placing priority files first, then by name"""
+        return (file_priority.get(entry.name, default_file_priority), entry.name)
+    
     # Use ultra-compact mode format for highest efficiency
     # (overrides compact_view if both are True)
     if ultra_compact_view:
         compact_view = False
     
+    # Detailed tree glyphs are simpler in ultra-compact mode
+    tree_glyphs = ULTRA_COMPACT_TREE_GLYPHS if ultra_compact_view else TREE_GLYPHS
+    
+    # Pick the content renderer for the view mode once, outside the per-file loop
+    if ultra_compact_view:
+        emit_file_content = emit_file_content_ultra_compact
+    elif compact_view:
+        emit_file_content = emit_file_content_compact
+    else:
+        emit_file_content = emit_file_content_standard
+    
     # Check if we're in reference tracking mode
     reference_tracking_mode = referenced_files is not None
     
+    # Scan from an absolute root, and key referenced files by normalized path
+    # once, so every membership test below is a plain set lookup
+    root_dir = os.path.abspath(root_dir)
+    if reference_tracking_mode:
+        referenced_files = {normalize_path(file_path) for file_path in referenced_files}
+    
+    # In reference tracking mode only the folders leading to a referenced file
+    # are worth scanning, so collect every ancestor folder of those files
+    referenced_dirs = set()
+    if reference_tracking_mode:
+        for file_path in referenced_files:
+            dir_path = os.path.dirname(file_path)
+            while dir_path not in referenced_dirs:
+                referenced_dirs.add(dir_path)
+                parent_dir = os.path.dirname(dir_path)
+                if parent_dir == dir_path:
+                    break
+                dir_path = parent_dir
+    
     # Initialize the output string
     output = []
     
-    # Perform token estimation if enabled
-    token_info = None
-    token_results = None
-    token_output_estimate = None
-    
-    if enable_token_estimation:
-        # Create a set of files to analyze
-        files_to_analyze = set()
+    # Large trees are written to disk in chunks instead of being held in memory.
+    # Exported formats are built from the complete line list in memory
+    stream_output = output_formats == ["txt"]
+    output_written = False
+    write_error = None
+    # Characters or words already written, for estimating the output file's tokens
+    written_token_units = 0
+    
+    def flush_output():
+        """Append the buffered output lines to the output file and clear the buffer"""
+        nonlocal output_written, write_error, written_token_units
+        if write_error or (output_written and not output):
+            return
         
-        if reference_tracking_mode and referenced_files:
-            # If in reference tracking mode, use referenced files
-            files_to_analyze = referenced_files
-        else:
-            # Otherwise, walk the directory tree to find matching files
-            for root, dirs, files in os.walk(root_dir):
-                # Skip blacklisted directories
-                if os.path.basename(root) in blacklist_folders:
-                    continue
-                    
-                for file in files:
-                    # Skip blacklisted files
-                    if file in blacklist_files:
-                        continue
-                        
-                    # Check extensions
-                    if any(file.endswith(ext) for ext in extensions):
-                        file_path = os.path.join(root, file)
-                        files_to_analyze.add(file_path)
+        content = "\n".join(output)
+        if output_written:
+            # Continue the previous chunk on a new line
+            content = "\n" + content
         
-        # Perform token estimation on selected files
-        token_results = token_estimator.estimate_tokens_for_directory(
-            root_dir,
-            extensions=extensions,
-            blacklist_folders=blacklist_folders,
-            blacklist_files=blacklist_files,
-            model=token_model,
-            method=token_method
-        )
+        if enable_token_estimation:
+            # Measure each chunk as it is written instead of joining the whole output later
+            written_token_units += token_estimator.count_estimation_units(content, token_method)
         
-        # Format token estimation summary
-        token_info = token_estimator.format_token_summary(token_results, root_dir)
-    
-    # Minimal header in ultra-compact mode
-    if ultra_compact_view:
-        output.append(f"TREE:{os.path.abspath(root_dir)}")
-        output.append(f"DATE:{datetime.datetime.now().strftime('%Y-%m-%d')}")
-        output.append(f"EXT:{','.join(extensions)}")
-        if reference_tracking_mode:
-            output.append(f"REF:{len(referenced_files)}")
-        if enable_token_estimation and token_results:
-            output.append(f"TOKENS:{token_results['total_tokens']}")
-    else:
-        output.append(f"File Structure - {os.path.abspath(root_dir)}")
-        output.append(f"Scan Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        output.append(f"Extensions: {', '.join(extensions)}")
-        if reference_tracking_mode:
-            output.append(f"Reference Tracking: Enabled (tracking {len(referenced_files)} files)")
-        if enable_token_estimation and token_results:
-            output.append(f"Token Estimation: Enabled (Model: {token_results['model_name']}, Est. Tokens: {token_results['total_tokens']:,})")
-        output.append("=" * 80)
-    
-    output.append("")
-    
-    # Generate barebones tree structure first
-    output.append("DIRECTORY STRUCTURE SUMMARY")
-    output.append("-" * 80)
-    
-    relevant_files_cache = {}
-    def has_relevant_files(dir_path, ext_set, referenced_files=None, depth=0, max_depth=100):
+        success, error = safe_write_file(output_file, content, 'a' if output_written else 'w')
+        if not success:
+            write_error = error
+        output_written = True
+        output.clear()
+    
+    # Both tree views and the relevance check share one scan per directory
+    directory_listing_cache = {}
+    def list_directory(dir_path):
         """
-        Check if directory or its subdirectories contain relevant files
+        Scan a directory once and return its filtered entries
 
         Args:
-            dir_path: Directory path to check
-            ext_set: Set of file extensions to include
-            referenced_files: Optional set of files for reference tracking mode
-            depth: Current recursion depth
-            max_depth: Maximum recursion depth to prevent stack overflow
-    
+            dir_path: Directory path to scan
+
         Returns:
-            Boolean indicating if relevant files are found
+            Tuple of (dirs, files) lists of os.DirEntry, each sorted by name.
+            Files are filtered by extension and blacklist, folders by blacklist.
+            In reference tracking mode only referenced files and folders
+            containing them are kept. Files have their stat result cached.
         """
-        # Check cache first
-        if dir_path in relevant_files_cache:
-            return relevant_files_cache[dir_path]
+        listing = directory_listing_cache.get(dir_path)
+        if listing is not None:
+            return listing
 
-        # Prevent stack overflow with depth limit
-        if depth >= max_depth:
-            print(f"Warning: Maximum directory depth reached at {dir_path}")
-            relevant_files_cache[dir_path] = False
-            return False
+        with os.scandir(dir_path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        dirs = []
+        files = []
+        for entry in entries:
+            item = entry.name
+            # Test the name against the filters before asking for the entry type
+            if item.endswith(ext_tuple) and item not in blacklist_files and entry.is_file():
+                if reference_tracking_mode and os.path.normcase(entry.path) not in referenced_files:
+                    continue
+                files.append(entry)
+                # Warm the DirEntry stat cache here, so the stat calls run on the
+                # scanning threads instead of one by one while rendering
+                try:
+                    entry.stat()
+                except OSError:
+                    # Reported when the file is rendered
+                    pass
+            elif item not in blacklist_folders and entry.is_dir():
+                # Skip whole subtrees that hold no referenced file
+                if reference_tracking_mode and os.path.normcase(entry.path) not in referenced_dirs:
+                    continue
+                dirs.append(entry)
 
-        try:
-            # Check if directory is blacklisted
-            dir_name = os.path.basename(dir_path)
-            if dir_name in blacklist_folders:
-                relevant_files_cache[dir_path] = False
-                return False
-    
-            # If in reference tracking mode and no files in this folder are referenced,
-            # we can exit early
-            if referenced_files is not None:
-                # Check if any file in directory or subdirectories is in referenced_files
-                dir_prefix = dir_path + os.sep
-                has_any_referenced = any(
-                    f.startswith(dir_prefix) for f in referenced_files
-                )
-                if not has_any_referenced:
-                    relevant_files_cache[dir_path] = False
-                    return False
-    
-            for item in os.listdir(dir_path):
-                full_path = os.path.join(dir_path, item)
-                if os.path.isfile(full_path):
-                    if item in blacklist_files:
+        listing = (dirs, files)
+        directory_listing_cache[dir_path] = listing
+        return listing
+
+    def prefetch_directory_listings(top_dir, max_depth=100):
+        """
+        Fill the listing cache for the whole tree using a pool of worker threads
+
+        os.scandir releases the GIL while waiting on the file system, so sibling
+        directories are scanned concurrently. Each task closes its directory
+        handle before returning, which keeps open handles bounded by SCAN_WORKERS.
+        Directories that fail to scan are left uncached and are handled by the
+        serial pass that follows.
+
+        Args:
+            top_dir: Directory to start from
+            max_depth: Maximum directory depth to descend into
+        """
+        if os.path.basename(top_dir) in blacklist_folders:
+            return
+
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+            pending = {executor.submit(list_directory, top_dir): 0}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = pending.pop(future)
+                    if future.exception() is not None or depth + 1 >= max_depth:
                         continue
+                    dirs, _ = future.result()
+                    for entry in dirs:
+                        pending[executor.submit(list_directory, entry.path)] = depth + 1
+
+    relevant_files_cache = {}
+    def mark_relevant_directories(top_dir, max_depth=100):
+        """
+        Record, bottom-up, whether each directory under top_dir contains relevant files
+
+        Directories are visited in post-order over the shared listing cache, so a
+        directory is resolved from its own files and its already-resolved children
+        without rescanning any subtree.
+
+        Args:
+            top_dir: Directory to start from
+            max_depth: Maximum directory depth to descend into
+        """
+        # Check if directory is blacklisted or holds no referenced file
+        # (subdirectories are already filtered by list_directory)
+        if os.path.basename(top_dir) in blacklist_folders or (
+                reference_tracking_mode and os.path.normcase(top_dir) not in referenced_dirs):
+            relevant_files_cache[top_dir] = False
+            return
+        
+        # Stack of (dir_path, depth, children_done)
+        stack = [(top_dir, 0, False)]
+        while stack:
+            dir_path, depth, children_done = stack.pop()
             
-                    # Check if file has relevant extension
-                    is_relevant_extension = any(item.endswith(ext) for ext in ext_set)
+            if children_done:
+                dirs, files = directory_listing_cache[dir_path]
+                relevant_files_cache[dir_path] = bool(files) or any(
+                    relevant_files_cache.get(entry.path, False) for entry in dirs
+                )
+                continue
             
-                    if is_relevant_extension:
-                        # If in reference tracking mode, only count referenced files
-                        if referenced_files is not None:
-                            if full_path in referenced_files:
-                                relevant_files_cache[dir_path] = True
-                                return True
-                        else:
-                            # In normal mode, any file with matching extension counts
-                            relevant_files_cache[dir_path] = True
-                            return True
-                
-                elif os.path.isdir(full_path):
-                    if has_relevant_files(full_path, ext_set, referenced_files, depth + 1, max_depth):
-                        relevant_files_cache[dir_path] = True
-                        return True
-    
-            relevant_files_cache[dir_path] = False
-            return False
-    
-        except (PermissionError, OSError):
-            relevant_files_cache[dir_path] = False
-            return False
+            # Limit depth to guard against symlink cycles and pathological trees
+            if depth >= max_depth:
+                print(f"Warning: Maximum directory depth reached at {dir_path}")
+                relevant_files_cache[dir_path] = False
+                continue
+            
+            try:
+                dirs, _ = list_directory(dir_path)
+            except (PermissionError, OSError):
+                relevant_files_cache[dir_path] = False
+                continue
+            
+            # Resolve this directory after all of its children
+            stack.append((dir_path, depth, True))
+            for entry in dirs:
+                stack.append((entry.path, depth + 1, False))
 
+    def has_relevant_files(dir_path):
+        """Check if directory or its subdirectories contain relevant files"""
+        return relevant_files_cache.get(dir_path, False)
 
+    def iter_listed_files(top_dir):
+        """
+        Yield the files kept by list_directory under top_dir from the listing cache
+
+        Yields:
+            (file_path, size_in_bytes) tuples
+        """
+        pending_dirs = [top_dir]
+        while pending_dirs:
+            listing = directory_listing_cache.get(pending_dirs.pop())
+            if listing is None:
+                continue
+            dirs, files = listing
+            for entry in files:
+                try:
+                    yield entry.path, entry.stat().st_size
+                except OSError:
+                    continue
+            pending_dirs.extend(entry.path for entry in reversed(dirs))
+
+
+    def ordered_listing(dir_path):
+        """Return the cached (dirs, files) of a directory in detailed tree order"""
+        dirs, files = list_directory(dir_path)
+        
+        # Sort directories and files by priority first, then alphabetically
+        # (listings are already in name order, so only re-sort with priorities)
+        if folder_priority:
+            dirs = sorted(dirs, key=folder_sort_key)
+        if file_priority:
+            files = sorted(files, key=file_sort_key)
+        return dirs, files
+    
+    def iter_content_files(top_dir):
+        """
+        Yield the DirEntry of each file whose contents the detailed tree shows,
+        in the order process_directory renders them
+        """
+        # Stack of (dir_path, files); files is None until the directory is expanded
+        stack = [(top_dir, None)]
+        while stack:
+            dir_path, files = stack.pop()
+            if files is not None:
+                yield from files
+                continue
+            
+            if (os.path.basename(dir_path) in blacklist_folders or not has_relevant_files(dir_path)
+                    or dir_path not in directory_listing_cache):
+                continue
+            
+            # Subdirectories are rendered before the files of their parent
+            dirs, files = ordered_listing(dir_path)
+            follow_ups = [(entry.path, None) for entry in dirs]
+            if files:
+                follow_ups.append((dir_path, files))
+            stack.extend(reversed(follow_ups))
+    
+    # Lines are cut to max_line_length when rendered, so the reader can drop the
+    # rest of a long line unless comment removal or the efficiency options need it
+    read_line_length = None
+    if (0 <= max_line_length < UNLIMITED_LINE_LENGTH and not (
+            remove_comments or exclude_empty_lines or smart_truncate or hide_repeated_sections)):
+        read_line_length = max_line_length
+    
+    # Futures of files being read ahead of rendering, by path
+    read_ahead = {}
+    read_ahead_entries = iter(())
+    read_executor = None
+    
+    def schedule_reads():
+        """Keep up to READ_AHEAD_FILES upcoming files reading on the worker threads"""
+        while len(read_ahead) < READ_AHEAD_FILES:
+            entry = next(read_ahead_entries, None)
+            if entry is None:
+                return
+            try:
+                file_stat = entry.stat()
+            except OSError:
+                # Not read ahead; the read when the file is rendered reports the error
+                continue
+            read_ahead[entry.path] = read_executor.submit(
+                read_file_cached, entry.path, file_stat, max_lines, remove_comments,
+                exclude_empty_lines, read_line_length)
+    
+    def read_file_content(entry):
+        """Return safe_read_file's result for a file, read ahead when it was scheduled"""
+        future = read_ahead.pop(entry.path, None)
+        if read_executor is not None:
+            schedule_reads()
+        if future is None:
+            return read_file_cached(entry.path, entry.stat(), max_lines, remove_comments,
+                                    exclude_empty_lines, read_line_length)
+        return future.result()
+
+    def run_tree_tasks(task, *args):
+        """
+        Run a tree renderer without Python recursion
+
+        Each task is a (function, args) pair. A task returns the follow-up tasks
+        for its directory in output order; they run before any task that was
+        already waiting, which reproduces a depth-first recursive walk.
+        """
+        stack = [(task, args)]
+        while stack:
+            task, args = stack.pop()
+            follow_ups = task(*args)
+            if follow_ups:
+                stack.extend(reversed(follow_ups))
+
+    def report_directory_error(current_dir, prefix, error):
+        """Append a directory-level error line to the detailed tree"""
+        if isinstance(error, PermissionError):
+            if ultra_compact_view:
+                output.append(f"{prefix}! Permission denied: {current_dir}")
+            else:
+                output.append(f"{prefix}❌ Permission denied accessing {current_dir}")
+        else:
+            if ultra_compact_view:
+                output.append(f"{prefix}! Error: {str(error)[:50]}")
+            else:
+                output.append(f"{prefix}❌ Error processing {current_dir}: {str(error)}")
 
     def process_directory(current_dir, prefix=""):
+        """
+        Add a directory line to the detailed tree
+
+        Returns:
+            Follow-up tasks rendering the subdirectories and then the files
+        """
         try:
             # Check if directory is blacklisted
             dir_name = os.path.basename(current_dir)
             if dir_name in blacklist_folders:
-                return False
+                return []
 
             # First check if this directory should be included
-            if not has_relevant_files(current_dir, extensions):
-                return False
+            if not has_relevant_files(current_dir):
+                return []
 
             # Add directory to tree with simpler format in ultra-compact mode
-            rel_path = os.path.relpath(current_dir, root_dir)
-            if rel_path == ".":
+            if current_dir == root_dir:
                 if ultra_compact_view:
                     output.append(f"{prefix}D {dir_name} (root)")
                 else:
@@ -281,84 +627,56 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
                 else:
                     output.append(f"{prefix}📁 {dir_name}")
 
-            # Process all items in current directory
-            items = sorted(os.listdir(current_dir))
-            dirs = []
-            files = []
-        
-            # Separate files and directories for better organization
-            for item in items:
-                full_path = os.path.join(current_dir, item)
-                if os.path.isfile(full_path):
-                    # If in reference tracking mode, only include referenced files
-                    if reference_tracking_mode:
-                        if full_path in referenced_files and item not in blacklist_files and any(item.endswith(ext) for ext in extensions):
-                            files.append(item)
-                    elif item not in blacklist_files and any(item.endswith(ext) for ext in extensions):
-                        files.append(item)
-                elif os.path.isdir(full_path) and item not in blacklist_folders:
-                    dirs.append(item)
-        
-            # Sort directories and files based on priority
-            def get_folder_priority(folder_name):
-                try:
-                    return priority_folders.index(folder_name)
-                except ValueError:
-                    return len(priority_folders)
-                
-            def get_file_priority(file_name):
-                try:
-                    return priority_files.index(file_name)
-                except ValueError:
-                    return len(priority_files)
-        
-            # Sort directories by priority first, then alphabetically
-            dirs.sort(key=lambda x: (get_folder_priority(x), x))
-        
-            # Sort files by priority first, then alphabetically
-            files.sort(key=lambda x: (get_file_priority(x), x))
+            # Reuse the cached scan of the current directory
+            dirs, files = ordered_listing(current_dir)
         
             # Process all directories first, then files
-            for i, item in enumerate(dirs):
-                full_path = os.path.join(current_dir, item)
-            
+            follow_ups = []
+            for i, entry in enumerate(dirs):
                 # Determine if this is the last item in the directory
                 is_last = (i == len(dirs) - 1 and len(files) == 0)
             
-                # Update prefix for child items - simpler in ultra-compact mode
-                if ultra_compact_view:
-                    child_prefix = prefix + ("L " if is_last else "| ")
-                    next_prefix = prefix + ("  " if is_last else "| ")
-                else:
-                    child_prefix = prefix + ("└── " if is_last else "├── ")
-                    next_prefix = prefix + ("    " if is_last else "│   ")
+                # Update prefix for child items
+                next_prefix = prefix + tree_glyphs[is_last][1]
+                follow_ups.append((process_directory, (entry.path, next_prefix)))
             
-                # Recursively process subdirectory
-                process_directory(full_path, next_prefix)
-        
-            # Now process all files
-            for i, item in enumerate(files):
-                full_path = os.path.join(current_dir, item)
+            if files:
+                follow_ups.append((process_directory_files, (current_dir, files, prefix)))
+            return follow_ups
+
+        except Exception as e:
+            report_directory_error(current_dir, prefix, e)
+            return []
+
+    def process_directory_files(current_dir, files, prefix):
+        """Add the files of a directory, with their contents, to the detailed tree"""
+        try:
+            for i, entry in enumerate(files):
+                item = entry.name
+                full_path = entry.path
+                
+                if stream_output and len(output) >= OUTPUT_FLUSH_LINES:
+                    flush_output()
             
                 # Determine if this is the last item
                 is_last = (i == len(files) - 1)
             
-                # Update prefix for file - simpler in ultra-compact mode
-                if ultra_compact_view:
-                    file_prefix = prefix + ("L " if is_last else "| ")
-                    content_prefix = prefix + ("  " if is_last else "| ")
-                else:
-                    file_prefix = prefix + ("└── " if is_last else "├── ")
-                    content_prefix = prefix + ("    " if is_last else "│   ")
+                # Update prefix for file
+                item_glyph, continuation_glyph = tree_glyphs[is_last]
+                file_prefix = prefix + item_glyph
+                content_prefix = prefix + continuation_glyph
             
                 # Add file to tree with minimal metadata in ultra-compact mode
-                file_size = os.path.getsize(full_path)
-                last_modified = datetime.datetime.fromtimestamp(
-                    os.path.getmtime(full_path)
-                ).strftime("%Y-%m-%d %H:%M:%S")
+                # (DirEntry caches the stat result, so size and mtime share one call)
+                file_stat = entry.stat()
+                file_size = file_stat.st_size
+            
+                # Ultra-compact mode doesn't show the modification time
+                if not ultra_compact_view:
+                    last_modified = format_timestamp(int(file_stat.st_mtime))
             
                 # Check if this file is referenced (for reference tracking mode)
-                is_referenced = reference_tracking_mode and full_path in referenced_files
+                is_referenced = reference_tracking_mode and os.path.normcase(full_path) in referenced_files
             
                 # Add special marker for referenced files with minimal format in ultra-compact mode
                 if ultra_compact_view:
@@ -385,7 +703,7 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
                     if reference_tracking_mode and not is_referenced:
                         continue
                 
-                    success, lines, error = safe_read_file(full_path, max_lines, remove_comments, exclude_empty_lines)
+                    success, lines, error = read_file_content(entry)
 
                     if not success:
                         # Make sure content_prefix is not None (safety check)
@@ -396,7 +714,7 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
                             output.append(f"{prefix_to_use}---[ERROR: {error}]---")
                         else:
                             output.append(f"{prefix_to_use}│ ERROR: {error}")
-                            output.append(f"{prefix_to_use}└{'─' * 70}")
+                            output.append(prefix_to_use + CONTENT_FOOTER)
                         continue
 
                 
@@ -412,47 +730,7 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
                     
                     # Make sure content_prefix is not None (safety check)
                     prefix_to_use = content_prefix if content_prefix is not None else ""
-                    if ultra_compact_view:
-                        # Ultra-compact view with absolute minimal formatting
-                        # Just display line number and content with no decorative elements
-                        is_small_file = len(lines) <= 3
-                        for line_num, line in enumerate(lines, 1):
-                            if line_num > max_lines:
-                                output.append(f"{prefix_to_use}+{len(lines)-max_lines}more")
-                                break
-                            truncated_line = line[:max_line_length] + ".." if len(line) > max_line_length else line
-                            # For very small files, skip line numbers to save space
-                            if is_small_file:
-                                output.append(f"{prefix_to_use}{truncated_line}")
-                            else:
-                                output.append(f"{prefix_to_use}{line_num}:{truncated_line}")
-                    elif compact_view:
-                        # Compact view with minimal decorative characters
-                        output.append(f"{prefix_to_use}---[FILE: {item}]---")
-                        for line_num, line in enumerate(lines, 1):
-                            if line_num > max_lines:
-                                output.append(f"{prefix_to_use}...(+{len(lines)-max_lines} more lines)")
-                                break
-                            truncated_line = line[:max_line_length] + "..." if len(line) > max_line_length else line
-                            output.append(f"{prefix_to_use}{line_num}:{truncated_line}")
-                        output.append(f"{prefix_to_use}---[END]---")
-                    else:
-                        # Standard view with full formatting
-                        # Add content header
-                        output.append(f"{prefix_to_use}┌{'─' * 70}")
-                        output.append(f"{prefix_to_use}│ FILE CONTENT: {item}")
-                        output.append(f"{prefix_to_use}├{'─' * 70}")
-                        
-                        # Add content with line numbers
-                        for line_num, line in enumerate(lines, 1):
-                            if line_num > max_lines:
-                                output.append(f"{prefix_to_use}│ ... (truncated after {max_lines} lines, {len(lines)-max_lines} more lines)")
-                                break
-                            truncated_line = line[:max_line_length] + "..." if len(line) > max_line_length else line
-                            output.append(f"{prefix_to_use}│ {line_num:4d} │ {truncated_line}")
-                        
-                        # Add content footer
-                        output.append(f"{prefix_to_use}└{'─' * 70}")
+                    emit_file_content(output, prefix_to_use, item, lines, max_lines, max_line_length)
                 except Exception as e:
                     # Make sure content_prefix is not None (safety check)
                     prefix_to_use = content_prefix if content_prefix is not None else ""
@@ -462,100 +740,126 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
                         output.append(f"{prefix_to_use}---[ERROR: {str(e)}]---")
                     else:
                         output.append(f"{prefix_to_use}│ ERROR reading file: {str(e)}")
-                        output.append(f"{prefix_to_use}└{'─' * 70}")
-
-            return True
+                        output.append(prefix_to_use + CONTENT_FOOTER)
 
-        except PermissionError:
-            if ultra_compact_view:
-                output.append(f"{prefix}! Permission denied: {current_dir}")
-            else:
-                output.append(f"{prefix}❌ Permission denied accessing {current_dir}")
-            return False
         except Exception as e:
-            if ultra_compact_view:
-                output.append(f"{prefix}! Error: {str(e)[:50]}")
-            else:
-                output.append(f"{prefix}❌ Error processing {current_dir}: {str(e)}")
-            return False
-
+            report_directory_error(current_dir, prefix, e)
 
-    # Generate barebones tree structure first
-    output.append("DIRECTORY STRUCTURE SUMMARY")
-    output.append("-" * 80)
-    
     def generate_barebones_tree(current_dir, prefix=""):
+        """
+        Add a directory line to the barebones tree
+
+        Returns:
+            Follow-up tasks rendering the subdirectories and then the files
+        """
         try:
             # Check if directory is blacklisted
             dir_name = os.path.basename(current_dir)
             if dir_name in blacklist_folders:
-                return False
+                return []
 
             # First check if this directory should be included
-            if not has_relevant_files(current_dir, extensions):
-                return False
+            if not has_relevant_files(current_dir):
+                return []
 
             # Add directory to tree
-            rel_path = os.path.relpath(current_dir, root_dir)
-            if rel_path == ".":
+            if current_dir == root_dir:
                 output.append(f"{prefix}📁 {dir_name} (root)")
             else:
                 output.append(f"{prefix}📁 {dir_name}")
 
-            # Process all items in current directory
-            items = sorted(os.listdir(current_dir))
-            dirs = []
-            files = []
-            
-            # Separate files and directories for better organization
-            for item in items:
-                full_path = os.path.join(current_dir, item)
-                if os.path.isfile(full_path):
-                    # If in reference tracking mode, only include referenced files
-                    if reference_tracking_mode:
-                        if full_path in referenced_files and item not in blacklist_files and any(item.endswith(ext) for ext in extensions):
-                            files.append(item)
-                    elif item not in blacklist_files and any(item.endswith(ext) for ext in extensions):
-                        files.append(item)
-                elif os.path.isdir(full_path) and item not in blacklist_folders:
-                    dirs.append(item)
+            # Reuse the cached scan of the current directory
+            dirs, files = list_directory(current_dir)
             
             # Process all directories first, then files
-            for i, item in enumerate(dirs):
-                full_path = os.path.join(current_dir, item)
-                
+            follow_ups = []
+            for i, entry in enumerate(dirs):
                 # Determine if this is the last item in the directory
                 is_last = (i == len(dirs) - 1 and len(files) == 0)
                 
                 # Update prefix for child items
-                child_prefix = prefix + ("└── " if is_last else "├── ")
-                next_prefix = prefix + ("    " if is_last else "│   ")
-                
-                # Recursively process subdirectory
-                generate_barebones_tree(full_path, next_prefix)
+                next_prefix = prefix + TREE_GLYPHS[is_last][1]
+                follow_ups.append((generate_barebones_tree, (entry.path, next_prefix)))
             
-            # Now process all files (just show file names, no content)
-            for i, item in enumerate(files):
-                full_path = os.path.join(current_dir, item)
+            if files:
+                follow_ups.append((generate_barebones_files, (files, prefix)))
+            return follow_ups
+
+        except Exception:
+            return []
+
+    def generate_barebones_files(files, prefix):
+        """Add the file names of a directory to the barebones tree"""
+        try:
+            # Just show file names, no content
+            for i, entry in enumerate(files):
+                item = entry.name
+                full_path = entry.path
                 # Determine if this is the last item
                 is_last = (i == len(files) - 1)
                 
                 # Update prefix for file
-                file_prefix = prefix + ("└── " if is_last else "├── ")
+                file_prefix = prefix + TREE_GLYPHS[is_last][0]
                 
                 # If in reference tracking mode, mark referenced files
-                if reference_tracking_mode and referenced_files is not None and full_path in referenced_files:
+                if reference_tracking_mode and os.path.normcase(full_path) in referenced_files:
                     output.append(f"{file_prefix}📄 {item} [REFERENCED]")
                 else:
                     output.append(f"{file_prefix}📄 {item}")
 
-            return True
-
         except Exception:
-            return False
+            pass
+    
+    # Scan the tree, then resolve which directories contain relevant files
+    # before rendering either tree
+    prefetch_directory_listings(root_dir)
+    mark_relevant_directories(root_dir)
+    
+    # Perform token estimation if enabled
+    token_info = None
+    token_results = None
+    token_output_estimate = None
+    
+    if enable_token_estimation:
+        # Estimate the raw files the tree includes, reusing the cached scan
+        token_results = token_estimator.estimate_tokens_for_files(
+            iter_listed_files(root_dir),
+            model=token_model,
+            method=token_method
+        )
+        
+        # Format token estimation summary
+        token_info = token_estimator.format_token_summary(token_results, root_dir)
+    
+    scan_date = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Minimal header in ultra-compact mode
+    if ultra_compact_view:
+        output.append(f"TREE:{os.path.abspath(root_dir)}")
+        output.append(f"DATE:{scan_date[:10]}")
+        output.append(f"EXT:{','.join(extensions)}")
+        if reference_tracking_mode:
+            output.append(f"REF:{len(referenced_files)}")
+        if enable_token_estimation and token_results:
+            output.append(f"TOKENS:{token_results['total_tokens']}")
+    else:
+        output.append(f"File Structure - {os.path.abspath(root_dir)}")
+        output.append(f"Scan Date: {scan_date}")
+        output.append(f"Extensions: {', '.join(extensions)}")
+        if reference_tracking_mode:
+            output.append(f"Reference Tracking: Enabled (tracking {len(referenced_files)} files)")
+        if enable_token_estimation and token_results:
+            output.append(f"Token Estimation: Enabled (Model: {token_results['model_name']}, Est. Tokens: {token_results['total_tokens']:,})")
+        output.append(SECTION_SEPARATOR)
+    
+    output.append("")
     
-    # Generate the barebones tree structure
-    generate_barebones_tree(root_dir)
+    # Generate the barebones tree structure first
+    output.append(DIRECTORY_SECTION_MARKER)
+    output.append(SUBSECTION_SEPARATOR)
+    output.append(DIRECTORY_SECTION_MARKER)
+    output.append(SUBSECTION_SEPARATOR)
+    run_tree_tasks(generate_barebones_tree, root_dir)
     
     # Add separator between barebones tree and detailed tree
     if priority_folders:
@@ -569,20 +873,30 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
             output.append(f"  {i+1}. {file}")
     
     # Always process the directory content regardless of token estimation
-    output.append("\nDETAILED FILE TREE WITH CONTENTS")
-    output.append("-" * 80)
-    process_directory(root_dir)
+    output.append("\n" + DETAILED_SECTION_MARKER)
+    output.append(SUBSECTION_SEPARATOR)
+    # Read file contents on worker threads, ahead of rendering, so file system
+    # waits overlap; results are still consumed in document order
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as read_executor:
+        read_ahead_entries = iter_content_files(root_dir)
+        schedule_reads()
+        run_tree_tasks(process_directory, root_dir)
+    read_executor = None
     
     # Add token information at the end if enabled
     if enable_token_estimation and token_info:
-        output.append("\n" + "=" * 80 + "\n")
+        output.append("\n" + SECTION_SEPARATOR + "\n")
         output.append("TOKEN ESTIMATION DETAILS")
-        output.append("-" * 80)
+        output.append(SUBSECTION_SEPARATOR)
         output.append(token_info)
         
-        # Estimate tokens in the output file too
+        # Estimate tokens in the output file too, adding the unwritten lines to the chunks already measured
         output_text = "\n".join(output)
-        output_tokens = token_estimator.estimate_tokens_for_text(output_text, token_model, token_method)
+        if output_written:
+            output_text = "\n" + output_text
+        output_tokens = token_estimator.estimate_tokens_from_units(
+            written_token_units + token_estimator.count_estimation_units(output_text, token_method),
+            token_model, token_method)
         
         output.append("\nToken Estimation for Output File:")
         output.append(f"Estimated tokens in this file: {output_tokens:,}")
@@ -606,12 +920,44 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
             comparison = token_estimator.compare_token_estimates(token_results, token_output_estimate)
             output.append("\n" + comparison)
     
-    # Write to output file
-    success, error = safe_write_file(output_file, output)
-    if not success:
-        return f"Error: {error}"
+    if output_formats == ["txt"]:
+        # Write the remaining output to the output file
+        flush_output()
+        if write_error:
+            return f"Error: {write_error}"
+
+        result = f"Text tree file generated successfully at {os.path.abspath(output_file)}"
+    else:
+        # A single format is written to output_file, several formats next to it
+        if len(output_formats) == 1:
+            export_files = {output_formats[0]: output_file}
+        else:
+            output_base, _ = os.path.splitext(output_file)
+            export_files = {fmt: output_base + FORMATS[fmt][0] for fmt in output_formats}
+        
+        # Export straight from memory instead of re-reading a text file from disk
+        export_lines = split_output_lines(output)
+        try:
+            ensure_directory(os.path.dirname(os.path.abspath(output_file)))
+            # The JSON export takes the header values directly rather than parsing them back
+            export_options = {"json": {"metadata": {
+                "root": root_dir,
+                "scan_date": scan_date,
+                "extensions": list(extensions),
+                "reference_tracking": reference_tracking_mode
+            }}}
+            with ThreadPoolExecutor(max_workers=len(export_files)) as executor:
+                futures = [executor.submit(FORMATS[fmt][1], export_lines, path, **export_options.get(fmt, {}))
+                           for fmt, path in export_files.items()]
+                for future in futures:
+                    future.result()
+        except Exception as e:
+            return f"Error: {str(e)}"
 
-    result = f"Text tree file generated successfully at {os.path.abspath(output_file)}"
+        result = "\n".join(
+            f"File tree generated successfully in {fmt.upper()} format at {os.path.abspath(path)}"
+            for fmt, path in export_files.items()
+        )
     
     # Add token information to the result message
     if enable_token_estimation and token_results:
@@ -622,6 +968,52 @@ def create_file_tree(root_dir, extensions, output_file, blacklist_folders=None,
     return result
 
 
+def emit_file_content_ultra_compact(output, prefix, item, lines, max_lines, max_line_length):
+    """Append file content in ultra-compact view: line numbers only, no decoration"""
+    shown_lines = truncate_lines(lines[:max_lines], max_line_length, "..")
+    if len(lines) <= 3:
+        # For very small files, skip line numbers to save space
+        output.extend(prefix + line for line in shown_lines)
+    else:
+        output.extend([
+            f"{prefix}{line_num}:{line}"
+            for line_num, line in enumerate(shown_lines, 1)
+        ])
+    if len(lines) > max_lines:
+        output.append(f"{prefix}+{len(lines)-max_lines}more")
+
+def emit_file_content_compact(output, prefix, item, lines, max_lines, max_line_length):
+    """Append file content in compact view with minimal decorative characters"""
+    output.append(f"{prefix}---[FILE: {item}]---")
+    shown_lines = truncate_lines(lines[:max_lines], max_line_length)
+    output.extend([
+        f"{prefix}{line_num}:{line}"
+        for line_num, line in enumerate(shown_lines, 1)
+    ])
+    if len(lines) > max_lines:
+        output.append(f"{prefix}...(+{len(lines)-max_lines} more lines)")
+    output.append(f"{prefix}---[END]---")
+
+def emit_file_content_standard(output, prefix, item, lines, max_lines, max_line_length):
+    """Append file content in standard view with a framed header and line numbers"""
+    # Add content header
+    output.append(prefix + CONTENT_HEADER_TOP)
+    output.append(f"{prefix}│ FILE CONTENT: {item}")
+    output.append(prefix + CONTENT_HEADER_BOTTOM)
+    
+    # Add content with line numbers
+    shown_lines = truncate_lines(lines[:max_lines], max_line_length)
+    line_prefix = prefix + "│ "
+    output.extend([
+        f"{line_prefix}{line_num:4d} │ {line}"
+        for line_num, line in enumerate(shown_lines, 1)
+    ])
+    if len(lines) > max_lines:
+        output.append(f"{prefix}│ ... (truncated after {max_lines} lines, {len(lines)-max_lines} more lines)")
+    
+    # Add content footer
+    output.append(prefix + CONTENT_FOOTER)
+
 def process_file_content(file_path, lines, hide_binary=False, smart_truncate=False, 
                        hide_repeated=False, max_line_length=300):
     """Process file content with efficiency options"""
@@ -654,15 +1046,13 @@ def clean_file_content(file_path, content_lines, remove_comments=False, exclude_
     """
     if not (remove_comments or exclude_empty_lines):
         return content_lines
-        
-    # Get file extension
-    _, ext = os.path.splitext(file_path.lower())
     
     # Process content based on settings and file type
-    processed_lines = content_lines.copy()
+    processed_lines = content_lines
     
-    # Step 1: Remove comments if enabled
+    # Step 1: Remove comments if enabled; only the comment syntax depends on the extension
     if remove_comments:
+        _, ext = os.path.splitext(file_path.lower())
         processed_lines = remove_code_comments(processed_lines, ext)
     
     # Step 2: Exclude empty lines if enabled
@@ -682,40 +1072,58 @@ def remove_code_comments(lines, ext):
     Returns:
         List of lines with comments removed
     """
-    # Join lines to handle multi-line comments
-    content = '\n'.join(lines)
-    
-    # C-style languages (C, C++, C#, Java, JavaScript, etc.)
-    if ext in ['.c', '.cpp', '.cs', '.h', '.hpp', '.java', '.js', '.ts', '.php', '.swift']:
-        # Remove multi-line comments (/* */)
-        content = re.sub(r'/\*[\s\S]*?\*/', '', content)
-        # Remove single-line comments (// and ///)
-        content = re.sub(r'//.*?$', '', content, flags=re.MULTILINE)
-    
-    # Python, Ruby, Bash, etc.
-    elif ext in ['.py', '.rb', '.sh', '.bash', '.yml', '.yaml']:
-        # Remove single-line comments (#)
-        content = re.sub(r'#.*?$', '', content, flags=re.MULTILINE)
-    
-    # HTML/XML
-    elif ext in ['.html', '.htm', '.xml', '.svg', '.jsp', '.aspx']:
-        # Remove HTML/XML comments (<!-- -->)
-        content = re.sub(r'<!--[\s\S]*?-->', '', content)
-    
-    # CSS
-    elif ext in ['.css', '.scss', '.less']:
-        # Remove CSS comments (/* */)
-        content = re.sub(r'/\*[\s\S]*?\*/', '', content)
-    
-    # SQL
-    elif ext in ['.sql']:
-        # Remove SQL single-line comments (--)
-        content = re.sub(r'--.*?$', '', content, flags=re.MULTILINE)
-        # Remove SQL multi-line comments (/* */)
-        content = re.sub(r'/\*[\s\S]*?\*/', '', content)
-    
-    # Return the content split back into lines
-    return content.split('\n')
+    syntax = COMMENT_SYNTAX.get(ext)
+    if syntax is None:
+        return lines
+    
+    # Join lines to handle multi-line comments, then split the content back into lines
+    return strip_comments('\n'.join(lines), *syntax).split('\n')
+
+def strip_comments(content, line_marker=None, block_start=None, block_end=None):
+    """
+    Remove line and block comments from text in a single left-to-right scan.
+    
+    Whichever comment starts first wins, so a block start inside a line comment
+    is ignored and the other way round. A block start without a matching end is
+    left in place. Each marker is searched for with str.find from the current
+    position, which keeps the scan linear even with many unterminated blocks.
+    
+    Args:
+        content: Text to strip
+        line_marker: Marker that comments out the rest of a line (None for none)
+        block_start: Marker that opens a block comment (None for none)
+        block_end: Marker that closes a block comment
+        
+    Returns:
+        The text without comments; line breaks after line comments are kept
+    """
+    pieces = []
+    pos = 0
+    line_at = content.find(line_marker) if line_marker else -1
+    block_at = content.find(block_start) if block_start else -1
+    
+    while line_at >= 0 or block_at >= 0:
+        if block_at >= 0 and (line_at < 0 or block_at < line_at):
+            end = content.find(block_end, block_at + len(block_start))
+            if end < 0:
+                # Nothing after this block start closes it, so no later block can close either
+                block_at = -1
+                continue
+            pieces.append(content[pos:block_at])
+            pos = end + len(block_end)
+        else:
+            pieces.append(content[pos:line_at])
+            end = content.find('\n', line_at)
+            pos = len(content) if end < 0 else end
+        
+        # Find the next markers past the removed comment
+        if 0 <= line_at < pos:
+            line_at = content.find(line_marker, pos)
+        if 0 <= block_at < pos:
+            block_at = content.find(block_start, pos)
+    
+    pieces.append(content[pos:])
+    return ''.join(pieces)
 
 def export_as_html(output_lines, output_file):
     """
@@ -725,67 +1133,90 @@ def export_as_html(output_lines, output_file):
         output_lines: List of text lines
         output_file: Path to save the HTML file
     """
-    html_output = ['<!DOCTYPE html>',
-                  '<html>',
-                  '<head>',
-                  '    <title>File Tree</title>',
-                  '    <style>',
-                  '        body { font-family: monospace; background-color: #f5f5f5; padding: 20px; }',
-                  '        .tree { white-space: pre; }',
-                  '        .dir { color: #0066cc; font-weight: bold; }',
-                  '        .file { color: #333; }',
-                  '        .referenced { color: #008800; font-weight: bold; }',
-                  '        .content { margin-left: 20px; border-left: 1px solid #ccc; padding-left: 10px; }',
-                  '        .content-header { color: #666; }',
-                  '        .line-number { color: #999; margin-right: 10px; }',
-                  '        .code { color: #333; }',
-                  '        .separator { color: #999; }',
-                  '    </style>',
-                  '</head>',
-                  '<body>',
-                  '    <div class="tree">']
+    # Converted lines are written in batches as they are generated, never all held at once
+    with open(output_file, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+        write_lines(f, generate_html_lines(output_lines))
+
+
+def escape_html(text):
+    """
+    Escape HTML special characters in a line of output.
+    
+    Most tree and content lines contain none of them, and a substring check is much
+    cheaper than str.translate on the non-ASCII box-drawing and icon characters.
+    
+    Args:
+        text: Text to escape
+        
+    Returns:
+        The escaped text, or text itself if there is nothing to escape
+    """
+    if '&' in text or '<' in text or '>' in text:
+        return text.translate(HTML_ESCAPE_TABLE)
+    return text
+
+def generate_html_lines(output_lines):
+    """
+    Convert the text output to HTML line by line
+    
+    Args:
+        output_lines: List of text lines
+        
+    Yields:
+        HTML lines
+    """
+    yield from HTML_DOCUMENT_START
     
     for line in output_lines:
-        if line.strip().startswith("📁"):
+        # Find a leading folder/file icon with one precompiled match
+        item_match = TREE_ITEM_PATTERN.match(line)
+        item_icon = item_match.group(1) if item_match else None
+        
+        if item_icon == "📁":
             # Directory line
-            html_line = f'<div class="dir">{line.replace("<", "&lt;").replace(">", "&gt;")}</div>'
-        elif "[REFERENCED]" in line and line.strip().startswith("📄"):
+            html_line = f'<div class="dir">{escape_html(line)}</div>'
+        elif item_icon == "📄" and "[REFERENCED]" in line:
             # Referenced file line
-            html_line = f'<div class="referenced">{line.replace("<", "&lt;").replace(">", "&gt;")}</div>'
-        elif line.strip().startswith("📄"):
+            html_line = f'<div class="referenced">{escape_html(line)}</div>'
+        elif item_icon == "📄":
             # File line
-            html_line = f'<div class="file">{line.replace("<", "&lt;").replace(">", "&gt;")}</div>'
+            html_line = f'<div class="file">{escape_html(line)}</div>'
         elif "│ FILE CONTENT:" in line:
             # Content header
-            html_line = f'<div class="content-header">{line.replace("<", "&lt;").replace(">", "&gt;")}</div>'
-        elif "│" in line and "│" in line[line.find("│")+1:]:
-            # Line with content
-            parts = line.split("│", 2)
-            if len(parts) >= 3 and parts[1].strip().isdigit():
+            html_line = f'<div class="content-header">{escape_html(line)}</div>'
+        elif line.find(CONTENT_BAR, line.find(CONTENT_BAR) + 1) >= 0:
+            # Line with content (at least two bars), found without slicing the line
+            numbered_match = NUMBERED_CONTENT_PATTERN.match(line)
+            if numbered_match:
                 # Line with line number
-                indent = parts[0]
-                line_num = parts[1].strip()
-                code = parts[2].replace("<", "&lt;").replace(">", "&gt;")
+                indent, line_num, code = numbered_match.groups()
+                indent = escape_html(indent)
+                code = escape_html(code)
                 html_line = f'<div><span>{indent}</span><span class="line-number">│ {line_num} │</span><span class="code">{code}</span></div>'
             else:
-                html_line = f'<div>{line.replace("<", "&lt;").replace(">", "&gt;")}</div>'
+                html_line = f'<div>{escape_html(line)}</div>'
         elif "=" * 10 in line or "-" * 10 in line:
             # Separator line
             html_line = f'<div class="separator">{line}</div>'
         else:
             # Regular line
-            html_line = f'<div>{line.replace("<", "&lt;").replace(">", "&gt;")}</div>'
+            html_line = f'<div>{escape_html(line)}</div>'
         
-        html_output.append("        " + html_line)
+        yield "        " + html_line
     
-    html_output.extend([
-        '    </div>',
-        '</body>',
-        '</html>'
-    ])
+    yield from HTML_DOCUMENT_END
+
+def export_as_text(output_lines, output_file):
+    """
+    Export the file tree as plain text
     
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(html_output))
+    Args:
+        output_lines: List of text lines
+        output_file: Path to save the text file
+    """
+    with open(output_file, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+        write_lines(f, output_lines)
+
 
 def export_as_markdown(output_lines, output_file):
     """
@@ -795,12 +1226,25 @@ def export_as_markdown(output_lines, output_file):
         output_lines: List of text lines
         output_file: Path to save the Markdown file
     """
-    md_output = []
+    # Converted lines are written in batches as they are generated, never all held at once
+    with open(output_file, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+        write_lines(f, generate_markdown_lines(output_lines))
+
+
+def generate_markdown_lines(output_lines):
+    """
+    Convert the text output to Markdown line by line
     
+    Args:
+        output_lines: List of text lines
+        
+    Yields:
+        Markdown lines
+    """
     # Add header
     if output_lines and "File Structure" in output_lines[0]:
-        md_output.append(f"# {output_lines[0]}")
-        md_output.append("")
+        yield f"# {output_lines[0]}"
+        yield ""
     
     # Add metadata
     metadata_lines = []
@@ -811,117 +1255,129 @@ def export_as_markdown(output_lines, output_file):
             metadata_lines.append(line)
     
     if metadata_lines:
-        md_output.append("## Metadata")
-        md_output.append("")
+        yield "## Metadata"
+        yield ""
         for line in metadata_lines:
-            md_output.append(f"{line}")
-        md_output.append("")
+            yield f"{line}"
+        yield ""
     
     # Process directory structure
     in_directory_section = False
     in_detailed_section = False
     in_file_content = False
+    content_start = 0
     
     for line in output_lines:
-        if "DIRECTORY STRUCTURE SUMMARY" in line:
-            md_output.append("## Directory Structure")
-            md_output.append("")
-            in_directory_section = True
-            continue
-        
-        if "DETAILED FILE TREE WITH CONTENTS" in line:
-            md_output.append("## Detailed File Tree")
-            md_output.append("")
-            in_directory_section = False
-            in_detailed_section = True
-            continue
-        
-        if "REFERENCE TRACKING SUMMARY" in line:
-            md_output.append("## Reference Tracking Summary")
-            md_output.append("")
-            in_directory_section = False
-            continue
+        # Section headers start their line, so one prefix check filters every other line
+        if line.startswith(SECTION_MARKERS):
+            if line.startswith(DIRECTORY_SECTION_MARKER):
+                yield "## Directory Structure"
+                yield ""
+                in_directory_section = True
+                continue
+            
+            if line.startswith(DETAILED_SECTION_MARKER):
+                yield "## Detailed File Tree"
+                yield ""
+                in_directory_section = False
+                in_detailed_section = True
+                continue
+            
+            if line.startswith(REFERENCE_SECTION_MARKER):
+                yield "## Reference Tracking Summary"
+                yield ""
+                in_directory_section = False
+                continue
             
         if "=" * 10 in line or "-" * 10 in line:
             continue
             
         if in_directory_section or in_detailed_section:
-            if line.strip().startswith("📁"):
+            # Find a leading folder/file icon with one precompiled match
+            item_match = TREE_ITEM_PATTERN.match(line)
+            item_icon = item_match.group(1) if item_match else None
+            
+            if item_icon == "📁":
                 # Directory line - count indentation to determine level
-                indent_level = line.find("📁") // 4
+                indent_level = item_match.start(1) // 4
                 spaces = "    " * indent_level
-                dir_name = line.strip().replace("📁 ", "")
-                md_output.append(f"{spaces}- **{dir_name}**")
+                # Slice past the icon and its space found by the match instead of rescanning the line
+                dir_name = line[item_match.end(1) + 1:].rstrip()
+                yield f"{spaces}- **{dir_name}**"
                 
-            elif line.strip().startswith("📄"):
+            elif item_icon == "📄":
                 # File line
-                indent_level = line.find("📄") // 4
+                indent_level = item_match.start(1) // 4
                 spaces = "    " * indent_level
-                file_parts = line.strip().replace("📄 ", "").split(" (", 1)
+                file_parts = line[item_match.end(1) + 1:].rstrip().split(" (", 1)
                 file_name = file_parts[0]
                 file_info = f" ({file_parts[1]}" if len(file_parts) > 1 else ""
                 
                 # Check if it's a referenced file
                 if "[REFERENCED]" in line:
-                    md_output.append(f"{spaces}- **{file_name}{file_info}** (Referenced)")
+                    yield f"{spaces}- **{file_name}{file_info}** (Referenced)"
                 else:
-                    md_output.append(f"{spaces}- {file_name}{file_info}")
+                    yield f"{spaces}- {file_name}{file_info}"
                 
             elif "FILE CONTENT:" in line:
-                # Start of file content
+                # Start of file content; the block's frame starts after the tree prefix
+                content_start = line.find(CONTENT_HEADER_MARKER)
                 file_name = line.split("FILE CONTENT:", 1)[1].strip()
-                md_output.append(f"### File: {file_name}")
-                md_output.append("")
-                md_output.append("```")
+                yield f"### File: {file_name}"
+                yield ""
+                yield "```"
                 in_file_content = True
                 
-            elif "└─" in line and in_file_content:
+            elif in_file_content and line.startswith(CONTENT_END, content_start):
                 # End of file content
-                md_output.append("```")
-                md_output.append("")
+                yield "```"
+                yield ""
                 in_file_content = False
                 
-            elif in_file_content and "│" in line:
-                # File content line - extract the actual content
-                parts = line.split("│", 2)
+            elif in_file_content:
+                # File content line - a single split past the tree prefix finds the
+                # bars around the line number and extracts the content
+                parts = line[content_start:].split(CONTENT_BAR, 2)
                 if len(parts) >= 3:
-                    content = parts[2]
-                    md_output.append(content)
+                    yield parts[2]
         else:
             # Include other lines like reference summaries
-            md_output.append(line)
-    
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(md_output))
+            yield line
 
 
 def format_size(size_bytes):
     """Format file size in a human-readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:.2f} TB"
+    # Most source files are small, so skip the unit lookup for plain bytes
+    if size_bytes < 1024:
+        return f"{size_bytes:.2f} B"
+    
+    # Each unit is 2**10 times the previous one, so the bit length picks it directly
+    unit_index = min((int(size_bytes).bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (10 * unit_index)):.2f} {SIZE_UNITS[unit_index]}"
+
+def normalize_path(path):
+    """Return an absolute, case-normalized form of a path for comparisons"""
+    return os.path.normcase(os.path.abspath(path))
 
-def export_as_json(output_lines, output_file):
+@functools.lru_cache(maxsize=4096)
+def format_timestamp(timestamp):
+    """Format a whole-second timestamp, cached since many files share the same second"""
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+def export_as_json(output_lines, output_file, metadata=None):
     """
     Export the file tree as JSON
     
     Args:
         output_lines: List of text lines
         output_file: Path to save the JSON file
+        metadata: Header values from create_file_tree (root, scan_date, extensions,
+                  reference_tracking); parsed from the header lines when not given
     """
-    import json
-    
-    # Extract root directory from output
-    root_dir = ""
-    if output_lines and "File Structure -" in output_lines[0]:
-        root_dir = output_lines[0].replace("File Structure -", "").strip()
-    
     # Build tree structure
     file_tree = {
         "metadata": {
-            "root": root_dir,
+            "root": "",
             "scan_date": "",
             "extensions": []
         },
@@ -932,102 +1388,141 @@ def export_as_json(output_lines, output_file):
         }
     }
     
-    # Extract metadata
-    for line in output_lines[1:5]:
-        if "Scan Date:" in line:
-            file_tree["metadata"]["scan_date"] = line.replace("Scan Date:", "").strip()
-        elif "Extensions:" in line:
-            extensions = line.replace("Extensions:", "").strip()
-            file_tree["metadata"]["extensions"] = [ext.strip() for ext in extensions.split(",")]
-        elif "Reference Tracking: Enabled" in line:
-            file_tree["reference_tracking"]["enabled"] = True
-    
-    # Process tree structure
-    current_path = []
-    current_node = file_tree["tree"]
+    tree_metadata = file_tree["metadata"]
+    reference_tracking = file_tree["reference_tracking"]
+    
+    if metadata is not None:
+        # Use the values the generator already knows instead of parsing them back
+        tree_metadata["root"] = metadata["root"]
+        tree_metadata["scan_date"] = metadata["scan_date"]
+        tree_metadata["extensions"] = list(metadata["extensions"])
+        reference_tracking["enabled"] = metadata["reference_tracking"]
+    elif output_lines and "File Structure -" in output_lines[0]:
+        # Extract root directory from output
+        tree_metadata["root"] = output_lines[0].replace("File Structure -", "").strip()
+    
+    # Only metadata precedes the detailed section, so locate it once and parse
+    # the tree from there instead of testing every summary line inside the main loop
+    try:
+        detail_start = output_lines.index(DETAILED_SECTION_MARKER)
+    except ValueError:
+        detail_start = next((index for index, line in enumerate(output_lines)
+                             if line.startswith(DETAILED_SECTION_MARKER)), len(output_lines))
+    
+    # Extract metadata from the header lines
+    if metadata is None:
+        for line in output_lines[1:min(5, detail_start)]:
+            if "Scan Date:" in line:
+                tree_metadata["scan_date"] = line.replace("Scan Date:", "").strip()
+            elif "Extensions:" in line:
+                extensions = line.replace("Extensions:", "").strip()
+                tree_metadata["extensions"] = [ext.strip() for ext in extensions.split(",")]
+            elif "Reference Tracking: Enabled" in line:
+                reference_tracking["enabled"] = True
+    
+    for line in output_lines[:detail_start]:
+        if "Total referenced files:" in line:
+            # Try to extract reference tracking info
+            count = line.replace("Total referenced files:", "").strip()
+            reference_tracking["count"] = int(count)
     
-    in_detailed_section = False
-    in_file_content = False
-    current_file = None
-    current_file_content = []
+    reference_tracking["files"] = parse_detailed_tree(
+        itertools.islice(output_lines, detail_start + 1, None), file_tree["tree"])
     
-    for line in output_lines:
-        if "DETAILED FILE TREE WITH CONTENTS" in line:
-            in_detailed_section = True
-            continue
-            
-        if not in_detailed_section:
-            # Try to extract reference tracking info
-            if "Total referenced files:" in line:
-                count = line.replace("Total referenced files:", "").strip()
-                file_tree["reference_tracking"]["count"] = int(count)
-            continue
-            
-        if in_file_content:
-            if "└─" in line:
-                # End of file content
-                current_node[current_file]["content"] = "\n".join(current_file_content)
-                in_file_content = False
-                current_file = None
-                current_file_content = []
-            elif "│" in line:
-                # File content line - extract the actual content
-                parts = line.split("│", 2)
-                if len(parts) >= 3:
-                    # Remove line number, keep only the content
-                    content = parts[2].strip()
-                    current_file_content.append(content)
-            continue
-            
-        # Process directory and file lines
-        if line.strip().startswith("📁"):
+    # Write JSON output
+    if ORJSON_AVAILABLE:
+        # orjson serializes in C and returns UTF-8 bytes ready to write
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(file_tree, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_file, 'w', encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
+            json.dump(file_tree, f, indent=2)
+
+
+def parse_detailed_tree(lines, tree):
+    """
+    Build the nested JSON tree from the lines of the detailed section.
+    
+    Args:
+        lines: Iterator over the text lines following the detailed section marker
+        tree: Dict to fill with directory dicts and file entries
+        
+    Returns:
+        List of referenced file paths, relative to the tree root
+    """
+    # Bind the per-line lookups to locals once; this loop runs for every line of the tree
+    match_tree_line = TREE_LINE_PATTERN.match
+    referenced_files = []
+    current_node = tree
+    # Node for each directory level, starting with the tree root, and the joined
+    # path of that directory with a trailing "/" so file paths need one concatenation
+    node_stack = [tree]
+    prefix_stack = [""]
+    
+    for line in lines:
+        # Parse indentation, icon, name, info and reference marker in one match
+        item_match = match_tree_line(line)
+        item_icon = item_match["kind"] if item_match else None
+        
+        if item_icon == "📁":
             # Directory line
-            indent = line.find("📁")
-            level = indent // 4
+            level = len(item_match["indent"]) // 4
             
             # Update current path based on level
-            current_path = current_path[:level]
-            dir_name = line.strip().replace("📁 ", "").split(" (")[0]
-            current_path.append(dir_name)
+            del node_stack[level + 1:]
+            del prefix_stack[level + 1:]
+            dir_name = item_match["name"]
             
-            # Navigate to current node
-            current_node = file_tree["tree"]
-            for path_part in current_path:
-                if path_part not in current_node:
-                    current_node[path_part] = {}
-                current_node = current_node[path_part]
+            # Descend one level from the parent node instead of walking from the root
+            current_node = node_stack[-1].setdefault(dir_name, {})
+            node_stack.append(current_node)
+            prefix_stack.append(prefix_stack[-1] + dir_name + "/")
                 
-        elif line.strip().startswith("📄"):
-            # File line
-            file_parts = line.strip().replace("📄 ", "").split(" (", 1)
-            file_name = file_parts[0]
-            file_info = file_parts[1].rstrip(")") if len(file_parts) > 1 else ""
-            
-            # Check if it's a referenced file
-            is_referenced = "[REFERENCED]" in line
+        elif item_icon == "📄":
+            # File line; a directory's files follow its subdirectories, so go back
+            # up to the directory at the level above the file
+            level = len(item_match["indent"]) // 4
+            del node_stack[level + 1:]
+            del prefix_stack[level + 1:]
+            current_node = node_stack[-1]
+            file_name = item_match["name"]
+            is_referenced = item_match["ref"] is not None
             
             # Add file to current node
             current_node[file_name] = {
                 "type": "file",
-                "info": file_info,
+                "info": item_match["info"] or "",
                 "referenced": is_referenced,
                 "content": ""
             }
             
             # Add to reference tracking list if referenced
             if is_referenced:
-                file_path = "/".join(current_path + [file_name])
-                file_tree["reference_tracking"]["files"].append(file_path)
+                referenced_files.append(prefix_stack[-1] + file_name)
             
         elif "FILE CONTENT:" in line:
-            # Start of file content
+            # Consume the content block in its own tight loop up to the closing line;
+            # the block's frame starts after the tree prefix
+            content_start = line.find(CONTENT_HEADER_MARKER)
             current_file = line.split("FILE CONTENT:", 1)[1].strip()
-            in_file_content = True
-            current_file_content = []
+            file_content = []
+            add_content = file_content.append
+            for line in lines:
+                if line.startswith(CONTENT_END, content_start):
+                    file_entry = current_node.get(current_file)
+                    if file_entry is not None:
+                        file_entry["content"] = "\n".join(file_content)
+                    break
+                # File content line - a single split past the tree prefix finds the
+                # bars around the line number and extracts the content
+                parts = line[content_start:].split(CONTENT_BAR, 2)
+                if len(parts) >= 3:
+                    # Remove line number, keep only the content
+                    add_content(parts[2].strip())
     
-    # Write JSON output
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(file_tree, f, indent=2)
+    return referenced_files
+
+
 def is_binary_file(file_path):
     """
     Check if a file is binary by reading the first few bytes.
@@ -1046,8 +1541,9 @@ def is_binary_file(file_path):
             if b'\x00' in chunk:
                 return True
                 
-            # Count printable vs non-printable characters
-            printable_chars = sum(1 for byte in chunk if 32 <= byte <= 126 or byte in (9, 10, 13))  # tab, LF, CR
+            # Count printable vs non-printable characters; translate deletes the
+            # printable bytes in one C pass, leaving only the non-printable ones
+            printable_chars = len(chunk) - len(chunk.translate(None, PRINTABLE_BYTES))
             if printable_chars < len(chunk) * 0.8:  # If less than 80% printable, consider it binary
                 return True
                 
@@ -1056,6 +1552,22 @@ def is_binary_file(file_path):
         # If there's an error, assume it's not binary
         return False
 
+def truncate_lines(lines, max_length, suffix="..."):
+    """
+    Cut lines longer than max_length and mark them with a suffix.
+    
+    Args:
+        lines: List of content lines
+        max_length: Maximum line length to keep
+        suffix: Text appended to lines that were cut
+        
+    Returns:
+        List of lines; lines within the limit are returned unchanged
+    """
+    if max_length >= UNLIMITED_LINE_LENGTH:
+        return lines
+    return [line if len(line) <= max_length else line[:max_length] + suffix for line in lines]
+
 def smart_truncate_line(line, max_length=80):
     """
     Intelligently truncate a line to preserve important content.
@@ -1073,7 +1585,7 @@ def smart_truncate_line(line, max_length=80):
     # Special handling for different line types
     
     # 1. Try to preserve function definitions and declarations
-    if re.match(r'^\s*(public|private|protected|internal|static|void|function|def|class|interface|struct|enum)\s+\w+', line):
+    if DECLARATION_LINE_PATTERN.match(line):
         # Find opening parenthesis
         paren_pos = line.find('(')
         if paren_pos > 0:
@@ -1093,7 +1605,7 @@ def smart_truncate_line(line, max_length=80):
                     return prefix + "..."
     
     # 2. Try to preserve imports, using statements, etc.
-    if re.match(r'^\s*(import|using|require|include|from)\s+', line):
+    if IMPORT_LINE_PATTERN.match(line):
         return line[:max_length-3] + "..."
     
     # 3. Preserve assignment statements by showing beginning and end
@@ -1124,21 +1636,29 @@ def collapse_repeated_sections(lines, threshold=4):
         
     result = []
     i = 0
+    line_count = len(lines)
     
-    while i < len(lines):
+    while i < line_count:
         # Check for repeating patterns starting from this line
         repeated = False
+        line = lines[i]
         
         # Try different pattern lengths
-        for pattern_len in range(1, min(10, len(lines) - i)):
+        for pattern_len in range(1, min(10, line_count - i)):
+            j = i + pattern_len
+            
+            # A pattern can only repeat if the line after it starts the pattern again,
+            # so most lengths are ruled out without slicing the lines
+            if threshold > 1 and lines[j] != line:
+                continue
+            
             # Extract pattern
-            pattern = lines[i:i+pattern_len]
+            pattern = lines[i:j]
             
             # Count repetitions
             repetitions = 1
-            j = i + pattern_len
             
-            while j + pattern_len <= len(lines) and lines[j:j+pattern_len] == pattern:
+            while j + pattern_len <= line_count and lines[j:j+pattern_len] == pattern:
                 repetitions += 1
                 j += pattern_len
             
@@ -1152,12 +1672,125 @@ def collapse_repeated_sections(lines, threshold=4):
         
         if not repeated:
             # If no repeating pattern found, add the line and continue
-            result.append(lines[i])
+            result.append(line)
             i += 1
     
     return result
 
-def safe_read_file(file_path, max_lines=None, remove_comments=False, exclude_empty_lines=False):
+def read_text_lines(file_obj, max_lines=None, max_line_length=None):
+    """
+    Read lines from an open text file, stopping after max_lines.
+    
+    Args:
+        file_obj: File object opened in text mode
+        max_lines: Maximum number of lines to read (None for all)
+        max_line_length: Keep only the first max_line_length + 1 characters of
+            each line, so longer lines still show as too long (None for all)
+        
+    Returns:
+        List of lines without line endings, followed by a truncation note
+        if the file has more than max_lines lines
+    """
+    text = file_obj.read(WHOLE_READ_CHARS)
+    if len(text) < WHOLE_READ_CHARS:
+        return split_text_lines(text, max_lines, max_line_length)
+    
+    # Large file: stream it instead of holding the whole text and its lines at once
+    file_obj.seek(0)
+    line_source = file_obj
+    if max_line_length is not None:
+        line_source = iter_bounded_lines(file_obj, max_line_length + 1)
+    
+    if not max_lines:
+        return [line.rstrip('\r\n') for line in line_source]
+    
+    # Only read one character past the limit to find out whether the file was truncated
+    lines = [line.rstrip('\r\n') for line in itertools.islice(line_source, max_lines)]
+    if file_obj.readline(1):
+        lines.append(f"... (truncated after {max_lines} lines)")
+    return lines
+
+def split_text_lines(text, max_lines=None, max_line_length=None):
+    """
+    Split text read from a text-mode file the same way read_text_lines does.
+    
+    Text-mode reads already turn every line ending into '\n', so splitting on
+    '\n' alone matches iterating the file (unlike str.splitlines, which also
+    breaks on form feeds and other separators).
+    
+    Args:
+        text: Text read from a file opened in text mode
+        max_lines: Maximum number of lines to keep (None for all)
+        max_line_length: Keep only the first max_line_length + 1 characters of
+            each line (None for all)
+        
+    Returns:
+        List of lines without line endings, followed by a truncation note
+        if the text has more than max_lines lines
+    """
+    if not text:
+        return []
+    
+    truncated = False
+    lines = text.split('\n', max_lines or -1)
+    if max_lines and len(lines) > max_lines:
+        # The last piece is everything after the first max_lines lines
+        truncated = bool(lines.pop())
+    elif text.endswith('\n'):
+        lines.pop()
+    
+    if max_line_length is not None:
+        limit = max_line_length + 1
+        lines = [line if len(line) <= limit else line[:limit] for line in lines]
+    if truncated:
+        lines.append(f"... (truncated after {max_lines} lines)")
+    return lines
+
+def iter_bounded_lines(file_obj, limit):
+    """
+    Yield the lines of an open text file, each cut to at most limit characters.
+    
+    The rest of an overlong line is read in READ_BUFFER_SIZE pieces and dropped,
+    so a huge single-line file never becomes one huge string.
+    
+    Args:
+        file_obj: File object opened in text mode
+        limit: Maximum number of characters to keep per line, including the newline
+    """
+    while True:
+        line = file_obj.readline(limit)
+        if not line:
+            return
+        if len(line) == limit and not line.endswith('\n'):
+            rest = line
+            while rest and not rest.endswith('\n'):
+                rest = file_obj.readline(READ_BUFFER_SIZE)
+        yield line
+
+def read_encoded_lines(binary_file, max_lines, encoding, errors='strict', max_line_length=None):
+    """
+    Decode lines from the start of an open binary file.
+    
+    Args:
+        binary_file: File object opened in binary mode
+        max_lines: Maximum number of lines to read (None for all)
+        encoding: Text encoding (None for the system default)
+        errors: How to handle decoding errors
+        max_line_length: Line length limit passed to read_text_lines
+        
+    Returns:
+        List of lines as returned by read_text_lines
+    """
+    binary_file.seek(0)
+    text_file = io.TextIOWrapper(binary_file, encoding=encoding, errors=errors)
+    try:
+        return read_text_lines(text_file, max_lines, max_line_length)
+    finally:
+        # Leave the binary file open for the next encoding attempt
+        text_file.detach()
+
+def safe_read_file(file_path, max_lines=None, remove_comments=False, exclude_empty_lines=False,
+                   max_line_length=None):
     """
     Safely read a file with proper error handling and content preprocessing.
     
@@ -1166,59 +1799,35 @@ def safe_read_file(file_path, max_lines=None, remove_comments=False, exclude_emp
         max_lines: Maximum number of lines to read (None for all)
         remove_comments: Whether to remove comments
         exclude_empty_lines: Whether to exclude empty lines
+        max_line_length: Drop the part of each line after this many characters
+            plus one (None for whole lines)
             
     Returns:
         Tuple of (success, content_lines, error_message)
     """
     try:
-        # Try UTF-8 first
-        with open(file_path, 'r', encoding='utf-8') as f:
-            if max_lines:
-                lines = []
-                for i, line in enumerate(f):
-                    if i >= max_lines:
-                        lines.append(f"... (truncated after {max_lines} lines)")
-                        break
-                    lines.append(line.rstrip('\r\n'))
-            else:
-                lines = f.read().splitlines()
-            
-            # Clean file content (remove comments and/or empty lines)
-            lines = clean_file_content(file_path, lines, remove_comments, exclude_empty_lines)
-            
-            # If the file is now empty after processing, add a note
-            if not lines:
-                lines = ["[File content empty after processing]"]
-                
-            return True, lines, None
-    except UnicodeDecodeError:
-        try:
-            # Try with system default encoding
-            with open(file_path, 'r') as f:
-                if max_lines:
-                    lines = []
-                    for i, line in enumerate(f):
-                        if i >= max_lines:
-                            lines.append(f"... (truncated after {max_lines} lines)")
-                            break
-                        lines.append(line.rstrip('\r\n'))
-                    return True, lines, None
-                else:
-                    return True, f.read().splitlines(), None
-        except UnicodeDecodeError:
-            # Try binary mode and decode as far as possible
+        # Open once and rewind for each encoding fallback instead of reopening the file
+        with open(file_path, 'rb', buffering=READ_BUFFER_SIZE) as binary_file:
             try:
-                with open(file_path, 'rb') as f:
-                    binary_data = f.read()
-                    # Try to decode binary data, ignoring errors
-                    text = binary_data.decode('utf-8', errors='replace')
-                    lines = text.splitlines()
-                    if max_lines and len(lines) > max_lines:
-                        lines = lines[:max_lines]
-                        lines.append(f"... (truncated after {max_lines} lines)")
+                # Try UTF-8 first, dropping a byte order mark if present
+                lines = read_encoded_lines(binary_file, max_lines, 'utf-8-sig', 'strict', max_line_length)
+            except UnicodeDecodeError:
+                try:
+                    # Try with system default encoding
+                    return True, read_encoded_lines(binary_file, max_lines, None, 'strict', max_line_length), None
+                except UnicodeDecodeError:
+                    # Decode as far as possible, replacing undecodable bytes
+                    lines = read_encoded_lines(binary_file, max_lines, 'utf-8-sig', 'replace', max_line_length)
                     return True, lines, "Warning: Binary file or encoding issues, some characters may be replaced"
-            except Exception as e:
-                return False, [], f"Error reading file: {str(e)}"
+        
+        # Clean file content (remove comments and/or empty lines)
+        lines = clean_file_content(file_path, lines, remove_comments, exclude_empty_lines)
+        
+        # If the file is now empty after processing, add a note
+        if not lines:
+            lines = ["[File content empty after processing]"]
+            
+        return True, lines, None
     except PermissionError:
         return False, [], "Permission denied when trying to read file"
     except FileNotFoundError:
@@ -1226,6 +1835,94 @@ def safe_read_file(file_path, max_lines=None, remove_comments=False, exclude_emp
     except Exception as e:
         return False, [], f"Error reading file: {str(e)}"
 
+def read_file_cached(file_path, file_stat, max_lines=None, remove_comments=False,
+                     exclude_empty_lines=False, max_line_length=None):
+    """
+    Read a file with safe_read_file, reusing the lines of an earlier read of the
+    same unchanged file with the same options.
+    
+    Args:
+        file_path: Path to the file
+        file_stat: Stat result of the file; its modification time and size tell
+            whether the file changed since it was cached
+        max_lines, remove_comments, exclude_empty_lines, max_line_length:
+            Passed on to safe_read_file
+            
+    Returns:
+        Tuple of (success, content_lines, error_message)
+    """
+    global cached_content_lines
+    key = (file_path, file_stat.st_mtime_ns, file_stat.st_size, max_lines,
+           remove_comments, exclude_empty_lines, max_line_length)
+    cached = FILE_CONTENT_CACHE.get(key)
+    if cached is not None:
+        return True, list(cached[0]), cached[1]
+    
+    success, lines, error = safe_read_file(file_path, max_lines, remove_comments,
+                                           exclude_empty_lines, max_line_length)
+    if success and len(lines) <= FILE_CONTENT_CACHE_LINES:
+        # Read-ahead workers call this concurrently
+        with FILE_CONTENT_CACHE_LOCK:
+            if key not in FILE_CONTENT_CACHE:
+                FILE_CONTENT_CACHE[key] = (tuple(lines), error)
+                cached_content_lines += len(lines)
+                # Drop the oldest files until the cache is within its line budget
+                while cached_content_lines > FILE_CONTENT_CACHE_LINES:
+                    oldest = FILE_CONTENT_CACHE.pop(next(iter(FILE_CONTENT_CACHE)))
+                    cached_content_lines -= len(oldest[0])
+    return success, lines, error
+
+def split_output_lines(lines):
+    """
+    Split output entries into single lines, as if they were joined with newlines
+    and split again, while reusing every entry that is already a single line.
+    
+    Args:
+        lines: List of output entries, some holding embedded line breaks
+        
+    Returns:
+        List of lines without line endings
+    """
+    result = []
+    for line in lines[:-1]:
+        if LINE_BREAK_PATTERN.search(line) is None:
+            result.append(line)
+        else:
+            # The newline that would join it to the next entry ends its last line
+            result.extend((line + "\n").splitlines())
+    if lines:
+        # A joined text has no newline after the last entry
+        result.extend(lines[-1].splitlines())
+    return result
+
+def write_lines(file_obj, lines):
+    """
+    Write lines separated by newlines, joining them in fixed-size batches
+    so the whole output is never held as one string.
+    
+    Args:
+        file_obj: File object opened in text mode
+        lines: Iterable of lines (no trailing newline is written)
+    """
+    lines = iter(lines)
+    batch = list(itertools.islice(lines, WRITE_BATCH_LINES))
+    while batch:
+        file_obj.write("\n".join(batch))
+        batch = list(itertools.islice(lines, WRITE_BATCH_LINES))
+        if batch:
+            file_obj.write("\n")
+
+def ensure_directory(dir_path):
+    """
+    Create a directory if needed, skipping directories already ensured by this process.
+    
+    Args:
+        dir_path: Absolute path of the directory
+    """
+    if dir_path not in ENSURED_DIRECTORIES:
+        os.makedirs(dir_path, exist_ok=True)
+        ENSURED_DIRECTORIES.add(dir_path)
+
 def safe_write_file(file_path, content, mode='w'):
     """
     Safely write content to a file with proper error handling
@@ -1238,24 +1935,52 @@ def safe_write_file(file_path, content, mode='w'):
     Returns:
         Tuple of (success, error_message)
     """
+    output_dir = os.path.dirname(os.path.abspath(file_path))
     try:
         # Ensure directory exists
-        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        ensure_directory(output_dir)
         
-        with open(file_path, mode, encoding='utf-8') as f:
+        with open(file_path, mode, encoding='utf-8', buffering=OUTPUT_BUFFER_SIZE) as f:
             if isinstance(content, list):
-                f.write('\n'.join(content))
+                write_lines(f, content)
             else:
                 f.write(content)
         return True, None
     except PermissionError:
         return False, "Permission denied when trying to write file"
     except FileNotFoundError:
+        # The directory may have been removed since it was ensured
+        ENSURED_DIRECTORIES.discard(output_dir)
         return False, "Cannot create file in the specified location"
     except Exception as e:
         return False, f"Error writing file: {str(e)}"
 
 
+# File extension and export function for each output format
+FORMATS = {
+    "txt": (".txt", export_as_text),
+    "html": (".html", export_as_html),
+    "markdown": (".md", export_as_markdown),
+    "json": (".json", export_as_json)
+}
+
+
+def parse_output_formats(output_format):
+    """
+    Split a comma-separated list of output formats into format names.
+    
+    Args:
+        output_format: Format name or comma-separated list, e.g. "html, markdown"
+        
+    Returns:
+        Tuple of (formats, unknown_formats) lists of stripped names; formats
+        is ["txt"] if no name was given
+    """
+    formats = [fmt.strip() for fmt in output_format.split(",") if fmt.strip()] or ["txt"]
+    unknown_formats = [fmt for fmt in formats if fmt not in FORMATS]
+    return formats, unknown_formats
+
+
 # Example usage
 if __name__ == "__main__":
     args = parse_args()
@@ -1265,12 +1990,27 @@ if __name__ == "__main__":
     blacklist_folders = set(args.blacklist_folders)
     blacklist_files = set(args.blacklist_files)
     
+    output_formats, unknown_formats = parse_output_formats(args.format)
+    if unknown_formats:
+        print(f"Error: Unknown output format: {', '.join(unknown_formats)}")
+        sys.exit(1)
+    
+    # Exported formats are written directly next to the requested output file
+    output_file = args.output_file
+    if output_formats != ['txt']:
+        output_base, _ = os.path.splitext(args.output_file)
+        if len(output_formats) == 1:
+            output_file = output_base + FORMATS[output_formats[0]][0]
+        if args.verbose:
+            for fmt in output_formats:
+                print(f"Writing {fmt.upper()} output to {output_base + FORMATS[fmt][0]}")
+    
     try:
         # Generate the file tree
         result = create_file_tree(
             args.root_dir,
             extensions,
-            args.output_file,
+            output_file,
             blacklist_folders=blacklist_folders,
             blacklist_files=blacklist_files,
             max_lines=args.max_lines,
@@ -1283,32 +2023,10 @@ if __name__ == "__main__":
             priority_files=args.priority_files,
             enable_token_estimation=args.enable_token_estimation if hasattr(args, 'enable_token_estimation') else False,
             token_model=args.token_model if hasattr(args, 'token_model') else "claude-3.5-sonnet",
-            token_method=args.token_method if hasattr(args, 'token_method') else "char"
+            token_method=args.token_method if hasattr(args, 'token_method') else "char",
+            output_format=args.format
         )
         
-        # If format is not txt, convert to the desired format
-        if args.format != 'txt':
-            with open(args.output_file, 'r', encoding='utf-8') as f:
-                output_lines = f.read().splitlines()
-            
-            # Change output file extension
-            output_base, _ = os.path.splitext(args.output_file)
-            if args.format == 'html':
-                new_output = f"{output_base}.html"
-                export_as_html(output_lines, new_output)
-            elif args.format == 'markdown':
-                new_output = f"{output_base}.md"
-                export_as_markdown(output_lines, new_output)
-            elif args.format == 'json':
-                new_output = f"{output_base}.json"
-                export_as_json(output_lines, new_output)
-            
-            # Delete the temporary text file
-            if args.verbose:
-                print(f"Converting {args.output_file} to {new_output}")
-            os.remove(args.output_file)
-            result = f"File tree generated successfully in {args.format.upper()} format at {os.path.abspath(new_output)}"
-        
         print(result)
         
     except Exception as e:
@@ -1,6 +1,8 @@
 import os
 import sys
 import subprocess
+import threading
+from collections import deque
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, Menu
 import webbrowser
@@ -11,12 +13,7 @@ from token_estimator import get_available_models, get_model_factors
 from method_visualization import CodeVisualizer
 
 # Import tree generation functions
-from file_tree_generator import (
-    create_file_tree, 
-    export_as_html, 
-    export_as_markdown, 
-    export_as_json
-)
+from file_tree_generator import create_file_tree
 from config_utils import load_config, save_config
 import token_estimator
 from update_checker import check_updates_at_startup, add_update_check_to_menu, CURRENT_VERSION, GITHUB_REPO
@@ -30,6 +27,11 @@ VISUALIZATION_AVAILABLE = True
 #except ImportError:
 #    VISUALIZATION_AVAILABLE = False
 
+# Log messages are collected and written to the status log at most this often
+LOG_FLUSH_INTERVAL_MS = 100
+# Only the most recent lines are kept in the status log
+LOG_MAX_LINES = 1000
+
 class FileTreeGeneratorApp:
     # Reference tracker for reference tracking export functionality
     reference_tracker = None
@@ -303,7 +305,8 @@ class FileTreeGeneratorApp:
         ttk.Button(buttons_frame, text="Save as Default", command=self.save_settings).pack(side=tk.LEFT, padx=5)
         
         # Generate button
-        ttk.Button(buttons_frame, text="Generate File Tree", command=self.generate_file_tree).pack(side=tk.RIGHT, padx=5)
+        self.generate_button = ttk.Button(buttons_frame, text="Generate File Tree", command=self.generate_file_tree)
+        self.generate_button.pack(side=tk.RIGHT, padx=5)
 
         # Export format options
         ttk.Label(advanced_frame, text="Export Format:").grid(row=1, column=2, sticky=tk.W, padx=(20, 5), pady=5)
@@ -320,6 +323,10 @@ class FileTreeGeneratorApp:
         self.log_text = ScrolledText(log_frame, wrap=tk.WORD, height=10)
         self.log_text.pack(fill=tk.BOTH, expand=True)
         self.log_text.config(state=tk.DISABLED)
+        
+        # Messages waiting for the next flush into the status log
+        self.log_buffer = deque()
+        self.log_flush_pending = False
         # Initialize reference tracking state
         self.selected_files = []
         self.toggle_reference_options()
@@ -434,24 +441,46 @@ class FileTreeGeneratorApp:
             self.output_file_var.set(file_path)
     
     def log(self, message):
+        # Inserting and scrolling per message makes long logs crawl, so messages are
+        # buffered and written in one batch; this is safe to call from worker threads
+        self.log_buffer.append(message)
+        if not self.log_flush_pending:
+            self.log_flush_pending = True
+            self.root.after(LOG_FLUSH_INTERVAL_MS, self.flush_log)
+    
+    def flush_log(self):
+        """Write buffered log messages to the status log and drop its oldest lines"""
+        self.log_flush_pending = False
+        messages = []
+        while self.log_buffer:
+            messages.append(self.log_buffer.popleft())
+        if not messages:
+            return
+        
         self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, message + "\n")
+        self.log_text.insert(tk.END, "\n".join(messages) + "\n")
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        if line_count > LOG_MAX_LINES:
+            self.log_text.delete('1.0', f'{line_count - LOG_MAX_LINES}.0')
         self.log_text.see(tk.END)
         self.log_text.config(state=tk.DISABLED)
-        self.root.update()
+    
+    def parse_list_settings(self):
+        """Parse the space-separated extension, blacklist and priority fields into lists"""
+        return {
+            'extensions': [ext if ext.startswith(".") else f".{ext}" for ext in self.extensions_var.get().split()],
+            'blacklist_folders': self.blacklist_folders_var.get().split(),
+            'blacklist_files': self.blacklist_files_var.get().split(),
+            'priority_folders': self.priority_folders_var.get().split(),
+            'priority_files': self.priority_files_var.get().split()
+        }
     
     def save_settings(self):
         """Save current settings as default configuration"""
         try:
             # Get current values from UI
-            extensions_str = self.extensions_var.get().strip()
-            extensions = [ext if ext.startswith(".") else f".{ext}" for ext in extensions_str.split()]
-        
-            blacklist_folders = self.blacklist_folders_var.get().split()
-            blacklist_files = self.blacklist_files_var.get().split()
-        
-            priority_folders = [folder for folder in self.priority_folders_var.get().split() if folder]
-            priority_files = [file for file in self.priority_files_var.get().split() if file]
+            list_settings = self.parse_list_settings()
+            
             # Get token estimation settings
             model_name = self.token_model_var.get()
             model_id = self.token_model_map.get(model_name, "claude-3.5-sonnet")
@@ -460,11 +489,11 @@ class FileTreeGeneratorApp:
             config = {
                 'root_dir': self.root_dir_var.get(),
                 'output_file': self.output_file_var.get(),
-                'extensions': extensions,
-                'blacklist_folders': blacklist_folders,
-                'blacklist_files': blacklist_files,
-                'priority_folders': priority_folders,
-                'priority_files': priority_files,
+                'extensions': list_settings['extensions'],
+                'blacklist_folders': list_settings['blacklist_folders'],
+                'blacklist_files': list_settings['blacklist_files'],
+                'priority_folders': list_settings['priority_folders'],
+                'priority_files': list_settings['priority_files'],
                 'max_lines': self.max_lines_var.get(),
                 'max_line_length': self.max_line_length_var.get(),
                 'compact_view': self.compact_view_var.get(),
@@ -546,21 +575,18 @@ class FileTreeGeneratorApp:
             # Update output file path in UI
             self.output_file_var.set(output_file)
 
-            # Parse extensions
-            extensions_str = self.extensions_var.get().strip()
-            if not extensions_str:
+            # Parse extensions, blacklists and priority lists the same way save_settings does
+            list_settings = self.parse_list_settings()
+            if not list_settings['extensions']:
                 messagebox.showerror("Error", "Please specify at least one file extension")
                 return
     
-            extensions = set(ext if ext.startswith(".") else f".{ext}" for ext in extensions_str.split())
-
-            # Parse blacklists
-            blacklist_folders = set(self.blacklist_folders_var.get().split())
-            blacklist_files = set(self.blacklist_files_var.get().split())
-
-            # Parse priority lists
-            priority_folders = [folder for folder in self.priority_folders_var.get().split() if folder]
-            priority_files = [file for file in self.priority_files_var.get().split() if file]
+            # Membership-tested collections are built once and never change during a run
+            extensions = frozenset(list_settings['extensions'])
+            blacklist_folders = frozenset(list_settings['blacklist_folders'])
+            blacklist_files = frozenset(list_settings['blacklist_files'])
+            priority_folders = list_settings['priority_folders']
+            priority_files = list_settings['priority_files']
 
             self.log(f"Starting file tree generation from {root_dir}")
             self.log(f"Included extensions: {', '.join(extensions)}")
@@ -568,8 +594,8 @@ class FileTreeGeneratorApp:
             self.log(f"Blacklisted files: {', '.join(blacklist_files)}")
             self.log(f"Export format: {export_format}")
     
-            # Initialize referenced_files to None (for non-reference tracking mode)
-            referenced_files = None
+            # Reference tracking settings (None for non-reference tracking mode)
+            reference_options = None
         
             # Handle reference tracking if enabled
             if self.reference_tracking_var.get():
@@ -591,7 +617,79 @@ class FileTreeGeneratorApp:
                 ignore_xaml = self.ignore_xaml_var.get()
                 if ignore_xaml:
                     self.log("Ignoring XAML/AXAML files (except selected ones)")
+                
+                reference_options = (list(self.selected_files), depth, ignore_xaml)
             
+            # Add token estimation parameters
+            enable_token_estimation = self.enable_token_estimation_var.get()
+            token_model = self.token_model_map.get(self.token_model_var.get(), "claude-3.5-sonnet")
+            token_method = self.token_method_var.get()
+        
+            # Log token estimation settings if enabled
+            if enable_token_estimation:
+                self.log(f"Token estimation enabled for model: {self.token_model_var.get()}")
+                self.log(f"Estimation method: {'Character-based' if token_method == 'char' else 'Word-based'}")
+            
+                # Update custom model factors if using custom model
+                if token_model == "custom":
+                    char_factor = self.custom_char_factor_var.get()
+                    word_factor = self.custom_word_factor_var.get()
+                    token_estimator.save_custom_model_factors(char_factor, word_factor)
+                    self.log(f"Using custom factors - Char: {char_factor}, Word: {word_factor}")
+            
+                # If showing all models is enabled, log that
+                if self.show_all_models_var.get():
+                    self.log("Including estimates for all models in output")
+                    
+            # Add this confirmation message before starting generation
+            if enable_token_estimation:
+                self.log("Token estimation is enabled - both file contents and token statistics will be included in the output")
+            
+            # Read every option here: Tk variables must only be touched from the main thread
+            tree_options = dict(
+                blacklist_folders=blacklist_folders,
+                blacklist_files=blacklist_files,
+                max_lines=self.max_lines_var.get(),
+                max_line_length=self.max_line_length_var.get(),
+                compact_view=self.compact_view_var.get(),
+                ultra_compact_view=self.ultra_compact_view_var.get(),
+                remove_comments=self.remove_comments_var.get(),
+                exclude_empty_lines=self.exclude_empty_lines_var.get(),
+                smart_truncate=self.smart_truncate_var.get(), 
+                hide_binary_files=self.hide_binary_files_var.get(),  # Added this parameter
+                hide_repeated_sections=self.hide_repeated_sections_var.get(),
+                priority_folders=priority_folders,
+                priority_files=priority_files,
+                enable_token_estimation=enable_token_estimation,
+                token_model=token_model,
+                token_method=token_method
+            )
+            
+            # Walk the tree on a worker thread so the window keeps repainting and
+            # responding; results come back to the main thread through root.after
+            self.generate_button.config(state=tk.DISABLED)
+            threading.Thread(
+                target=self.run_generation,
+                args=(root_dir, extensions, output_file, export_format, reference_options, tree_options),
+                daemon=True
+            ).start()
+    
+        except Exception as e:
+            error_msg = f"Error: {str(e)}"
+            self.log(error_msg)
+            messagebox.showerror("Error", error_msg)
+    
+    def run_generation(self, root_dir, extensions, output_file, export_format, reference_options, tree_options):
+        """Analyze references, generate the tree and export it; runs on a worker thread"""
+        try:
+            output_base = os.path.splitext(output_file)[0]
+            
+            # Initialize referenced_files to None (for non-reference tracking mode)
+            referenced_files = None
+            
+            if reference_options is not None:
+                selected_files, depth, ignore_xaml = reference_options
+                
                 # Parse and analyze C# files
                 self.log("Analyzing C# and XAML references...")
                 reference_manager = ReferenceTrackingManager(root_dir, log_callback=self.log)
@@ -602,7 +700,7 @@ class FileTreeGeneratorApp:
             
                 # Find related files
                 referenced_files = reference_manager.find_related_files(
-                    self.selected_files, 
+                    selected_files, 
                     depth,
                     ignore_xaml=ignore_xaml
                 )
@@ -632,87 +730,36 @@ class FileTreeGeneratorApp:
         
                 self.log(f"Saved list of referenced files to {reference_list_file}")
             
-            # Add token estimation parameters
-            enable_token_estimation = self.enable_token_estimation_var.get()
-            token_model = self.token_model_map.get(self.token_model_var.get(), "claude-3.5-sonnet")
-            token_method = self.token_method_var.get()
-        
-            # Log token estimation settings if enabled
-            if enable_token_estimation:
-                self.log(f"Token estimation enabled for model: {self.token_model_var.get()}")
-                self.log(f"Estimation method: {'Character-based' if token_method == 'char' else 'Word-based'}")
-            
-                # Update custom model factors if using custom model
-                if token_model == "custom":
-                    char_factor = self.custom_char_factor_var.get()
-                    word_factor = self.custom_word_factor_var.get()
-                    token_estimator.save_custom_model_factors(char_factor, word_factor)
-                    self.log(f"Using custom factors - Char: {char_factor}, Word: {word_factor}")
-            
-                # If showing all models is enabled, log that
-                if self.show_all_models_var.get():
-                    self.log("Including estimates for all models in output")
-                    
-            # Add this confirmation message before starting generation
-            if enable_token_estimation:
-                self.log("Token estimation is enabled - both file contents and token statistics will be included in the output")
-            # Create a temporary text output file
-            temp_output = output_file
-            if export_format != 'txt':
-                temp_output = output_file + '.temp.txt'
-        
-            # Generate file tree
+            # Generate file tree; other formats are exported straight from the generated
+            # lines instead of round-tripping through a temporary text file
             result = create_file_tree(
                 root_dir, 
                 extensions, 
-                temp_output,
-                blacklist_folders=blacklist_folders,
-                blacklist_files=blacklist_files,
-                max_lines=self.max_lines_var.get(),
-                max_line_length=self.max_line_length_var.get(),
-                compact_view=self.compact_view_var.get(),
-                ultra_compact_view=self.ultra_compact_view_var.get(),
-                remove_comments=self.remove_comments_var.get(),
-                exclude_empty_lines=self.exclude_empty_lines_var.get(),
-                smart_truncate=self.smart_truncate_var.get(), 
-                hide_binary_files=self.hide_binary_files_var.get(),  # Added this parameter
-                hide_repeated_sections=self.hide_repeated_sections_var.get(),
-                priority_folders=priority_folders,
-                priority_files=priority_files,
+                output_file,
                 referenced_files=referenced_files,
-                enable_token_estimation=enable_token_estimation,
-                token_model=token_model,
-                token_method=token_method
+                output_format=export_format,
+                **tree_options
             )
 
-            # Convert to desired format if needed
-            if export_format != 'txt':
-                with open(temp_output, 'r', encoding='utf-8') as f:
-                    output_lines = f.read().splitlines()
-    
-                if export_format == 'html':
-                    export_as_html(output_lines, output_file)
-                elif export_format == 'markdown':
-                    export_as_markdown(output_lines, output_file)
-                elif export_format == 'json':
-                    export_as_json(output_lines, output_file)
+            self.root.after(0, self.finish_generation, result, output_file)
     
-                # Clean up temporary file
-                os.remove(temp_output)
+        except Exception as e:
+            self.root.after(0, self.finish_generation, f"Error: {str(e)}", None)
     
-                result = f"File tree generated successfully in {export_format.upper()} format at {os.path.abspath(output_file)}"
-
-            self.log(result)
-            messagebox.showinfo("Success", result)
+    def finish_generation(self, result, output_file):
+        """Report a finished generation on the main thread; output_file is None on failure"""
+        self.generate_button.config(state=tk.NORMAL)
+        self.log(result)
+        
+        if output_file is None:
+            messagebox.showerror("Error", result)
+            return
+        
+        messagebox.showinfo("Success", result)
 
-            # Ask if user wants to open the file
-            if messagebox.askyesno("Open File", "Do you want to open the generated file?"):
-                self.open_file(output_file)
-    
-        except Exception as e:
-            error_msg = f"Error: {str(e)}"
-            self.log(error_msg)
-            messagebox.showerror("Error", error_msg)
+        # Ask if user wants to open the file
+        if messagebox.askyesno("Open File", "Do you want to open the generated file?"):
+            self.open_file(output_file)
     
     def create_menu(self):
         """Create application menu bar"""
@@ -1698,21 +1745,18 @@ class FileTreeGeneratorApp:
                 word_factor = self.custom_word_factor_var.get()
                 token_estimator.save_custom_model_factors(char_factor, word_factor)
     
-            # Parse extensions
-            extensions_str = self.extensions_var.get().strip()
-            if not extensions_str:
+            # Parse extensions and blacklists
+            list_settings = self.parse_list_settings()
+            if not list_settings['extensions']:
                 self.token_preview_var.set("No file extensions specified")
                 return
     
-            extensions = set(ext if ext.startswith(".") else f".{ext}" for ext in extensions_str.split())
-
-            # Parse blacklists
-            blacklist_folders = set(self.blacklist_folders_var.get().split())
-            blacklist_files = set(self.blacklist_files_var.get().split())
+            extensions = frozenset(list_settings['extensions'])
+            blacklist_folders = frozenset(list_settings['blacklist_folders'])
+            blacklist_files = frozenset(list_settings['blacklist_files'])
 
             # Update preview with quick estimation (limit to 500 files for performance)
             self.token_preview_var.set("Estimating tokens...")
-            self.root.update()
 
             # Run estimation in a separate thread to avoid UI freezing
             import threading
@@ -12,7 +12,10 @@ actual token usage.
 
 import re
 import os
+import stat
+import io
 import json
+import hashlib
 from typing import Dict, Tuple, List, Any, Optional
 
 # Define known models with their approximate token factors
@@ -75,6 +78,12 @@ MODEL_FACTORS = {
     }
 }
 
+# Word counts of texts at least WORD_COUNT_CACHE_MIN_LENGTH characters long, keyed by
+# a hash of the text, so unchanged files are not re-counted when a tree is regenerated
+WORD_COUNT_CACHE = {}
+WORD_COUNT_CACHE_SIZE = 4096
+WORD_COUNT_CACHE_MIN_LENGTH = 4096
+
 def get_available_models():
     """Get a list of available model names for display in UI"""
     return [(model_id, factor['name']) for model_id, factor in MODEL_FACTORS.items()]
@@ -121,13 +130,76 @@ def estimate_tokens_for_text(text, model="claude-3.5-sonnet", method="char"):
                 return max(1, int(word_count * factors["word_factor"]))
             
         # For smaller texts, count all words
-        word_count = len(re.findall(r'\S+', text))
+        word_count = count_words(text)
         return max(1, int(word_count * factors["word_factor"]))
     else:
         # Default to character-based estimation
         return max(1, int(len(text) * factors["char_factor"]))
 
-def estimate_tokens_for_file(file_path, model="claude-3.5-sonnet", method="char"):
+def count_words(text):
+    """
+    Count the whitespace-separated words in a text, reusing the count of a
+    large text that was counted before.
+    
+    Args:
+        text: Text to count words in
+        
+    Returns:
+        Number of words
+    """
+    if len(text) < WORD_COUNT_CACHE_MIN_LENGTH:
+        return len(re.findall(r'\S+', text))
+    
+    # Hashing is several times faster than the regex scan it saves
+    key = hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    word_count = WORD_COUNT_CACHE.get(key)
+    if word_count is None:
+        word_count = len(re.findall(r'\S+', text))
+        if len(WORD_COUNT_CACHE) >= WORD_COUNT_CACHE_SIZE:
+            # Drop the oldest entry
+            del WORD_COUNT_CACHE[next(iter(WORD_COUNT_CACHE))]
+        WORD_COUNT_CACHE[key] = word_count
+    return word_count
+
+def count_estimation_units(text, method="char"):
+    """
+    Count the characters or words that estimate_tokens_for_text scales by a model factor.
+    
+    Counts for consecutive pieces of a text add up to the count for the whole text
+    when the pieces are split at whitespace, so a large output can be measured
+    chunk by chunk instead of being joined into one string.
+    
+    Args:
+        text: Text to measure
+        method: Estimation method ('char' or 'word')
+        
+    Returns:
+        Number of words for the word method, otherwise number of characters
+    """
+    if method == "word":
+        return len(re.findall(r'\S+', text))
+    return len(text)
+
+def estimate_tokens_from_units(unit_count, model="claude-3.5-sonnet", method="char"):
+    """
+    Estimate tokens from a count returned by count_estimation_units.
+    
+    Args:
+        unit_count: Total number of characters or words
+        model: Model ID from MODEL_FACTORS
+        method: Estimation method ('char' or 'word')
+        
+    Returns:
+        Estimated token count
+    """
+    factors = MODEL_FACTORS.get(model, MODEL_FACTORS["claude-3.5-sonnet"])
+    if method == "word":
+        return max(1, int(unit_count * factors["word_factor"]))
+    if not unit_count:
+        return 0
+    return max(1, int(unit_count * factors["char_factor"]))
+
+def estimate_tokens_for_file(file_path, model="claude-3.5-sonnet", method="char", check_file=True):
     """
     Estimate token count for a file with improved error handling.
     
@@ -135,31 +207,33 @@ def estimate_tokens_for_file(file_path, model="claude-3.5-sonnet", method="char"
         file_path: Path to the file
         model: Model ID from MODEL_FACTORS
         method: Estimation method ('char' or 'word')
+        check_file: Whether to check that the path is a regular file first
+                    (callers that already have its stat result can skip this)
         
     Returns:
         (success, token_count, error_message)
     """
     try:
         # Check if the file exists and is a regular file
-        if not os.path.isfile(file_path):
+        if check_file and not os.path.isfile(file_path):
             return False, 0, "Not a regular file"
             
-        # Try to open the file with UTF-8 encoding
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except UnicodeDecodeError:
-            # If UTF-8 fails, try with system default encoding
+        # Open once and rewind for each encoding fallback instead of reopening the file
+        with open(file_path, 'rb') as binary_file:
             try:
-                with open(file_path, 'r') as f:
-                    content = f.read()
+                # Try UTF-8 first
+                content = read_decoded_text(binary_file, 'utf-8')
             except UnicodeDecodeError:
-                # If that fails too, try binary mode with replace option
                 try:
-                    with open(file_path, 'rb') as f:
-                        content = f.read().decode('utf-8', 'replace')
-                except Exception as e:
-                    return False, 0, f"Error reading file: {str(e)}"
+                    # If UTF-8 fails, try with system default encoding
+                    content = read_decoded_text(binary_file, None)
+                except UnicodeDecodeError:
+                    # If that fails too, decode the raw bytes with the replace option
+                    try:
+                        binary_file.seek(0)
+                        content = binary_file.read().decode('utf-8', 'replace')
+                    except Exception as e:
+                        return False, 0, f"Error reading file: {str(e)}"
                     
         # For very large files, only process the first 1MB to avoid memory issues
         if len(content) > 1024 * 1024:
@@ -171,6 +245,25 @@ def estimate_tokens_for_file(file_path, model="claude-3.5-sonnet", method="char"
     except Exception as e:
         return False, 0, str(e)
 
+def read_decoded_text(binary_file, encoding):
+    """
+    Read a whole open binary file as text, as open(path, 'r') would.
+    
+    Args:
+        binary_file: File object opened in binary mode
+        encoding: Text encoding (None for the system default)
+        
+    Returns:
+        The decoded text, with line endings translated to newlines
+    """
+    binary_file.seek(0)
+    text_file = io.TextIOWrapper(binary_file, encoding=encoding)
+    try:
+        return text_file.read()
+    finally:
+        # Leave the binary file open for the next encoding attempt
+        text_file.detach()
+
 def estimate_tokens_for_directory(directory, extensions=None, blacklist_folders=None, 
                                blacklist_files=None, model="claude-3.5-sonnet", 
                                method="char", max_files=None):
@@ -192,10 +285,78 @@ def estimate_tokens_for_directory(directory, extensions=None, blacklist_folders=
     blacklist_folders = set(blacklist_folders or [])
     blacklist_files = set(blacklist_files or [])
     
-    # Convert extensions to a set for faster lookup
+    # str.endswith takes a tuple, so each file name is matched in a single C-level call
     if extensions:
-        extensions = set(extensions)
+        extensions = tuple({ext.lower() for ext in extensions})
+    
+    files = iter_matching_files(directory, extensions, blacklist_folders, blacklist_files)
+    return estimate_tokens_for_files(files, model, method, max_files)
+
+def iter_matching_files(directory, extensions, blacklist_folders, blacklist_files):
+    """
+    Walk a directory top-down and yield the regular files to estimate.
+    
+    Args:
+        directory: Root directory to scan
+        extensions: Tuple of lowercase file extensions to include (None for all)
+        blacklist_folders: Set of folder names to exclude
+        blacklist_files: Set of file names to exclude
+        
+    Yields:
+        (file_path, size_in_bytes) tuples
+    """
+    # Walk with scandir, so each entry's type comes from the directory listing
+    # and a single stat call gives both the file type and the size
+    pending_dirs = [directory]
+    while pending_dirs:
+        try:
+            with os.scandir(pending_dirs.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                # Skip blacklisted folders and, like os.walk, don't follow directory symlinks
+                if entry.name not in blacklist_folders and not entry.is_symlink():
+                    subdirs.append(entry.path)
+                continue
+            
+            # Skip blacklisted files and check extensions if provided
+            if entry.name in blacklist_files:
+                continue
+            if extensions and not entry.name.lower().endswith(extensions):
+                continue
+            
+            # Skip anything that is not a regular file, such as broken symbolic links
+            try:
+                file_stat = entry.stat()
+            except OSError:
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                yield entry.path, file_stat.st_size
+        
+        # Visit subdirectories in listing order after this directory's files, as os.walk does
+        pending_dirs.extend(reversed(subdirs))
+
+def estimate_tokens_for_files(files, model="claude-3.5-sonnet", method="char", max_files=None):
+    """
+    Estimate token count for files that were already found by a directory walk.
     
+    Args:
+        files: Iterable of (file_path, size_in_bytes) tuples for regular files
+        model: Model ID from MODEL_FACTORS
+        method: Estimation method ('char' or 'word')
+        max_files: Maximum number of files to process (None for all)
+        
+    Returns:
+        Dictionary with token estimation results
+    """
     total_tokens = 0
     processed_files = 0
     skipped_files = 0
@@ -210,62 +371,36 @@ def estimate_tokens_for_directory(directory, extensions=None, blacklist_folders=
     if method not in ["char", "word"]:
         method = "char"
     
-    # Walk through directory
-    for root, dirs, files in os.walk(directory):
-        # Skip blacklisted folders - need to modify dirs in place
-        dirs[:] = [d for d in dirs if d not in blacklist_folders]
-        
-        for file in files:
-            # Skip blacklisted files
-            if file in blacklist_files:
-                continue
-                
-            # Check extensions if provided
-            if extensions:
-                _, ext = os.path.splitext(file)
-                if ext.lower() not in extensions:
-                    continue
+    for file_path, file_size in files:
+        # Check if we've reached the maximum number of files
+        if max_files is not None and processed_files >= max_files:
+            skipped_files += 1
+            continue
             
-            # Check if we've reached the maximum number of files
-            if max_files is not None and processed_files >= max_files:
-                skipped_files += 1
-                continue
-                
-            file_path = os.path.join(root, file)
+        # Skip files that are too large (>10MB) for performance
+        if file_size > 10 * 1024 * 1024:
+            skipped_files += 1
+            continue
             
-            # Skip directories masquerading as files (symbolic links)
-            if not os.path.isfile(file_path):
-                continue
-                
-            # Skip files that are too large (>10MB) for performance
-            try:
-                if os.path.getsize(file_path) > 10 * 1024 * 1024:
-                    skipped_files += 1
-                    continue
-            except (OSError, IOError):
-                skipped_files += 1
-                continue
-                
-            # Estimate tokens for this file
-            success, token_count, error = estimate_tokens_for_file(file_path, model, method)
-            if success:
-                total_tokens += token_count
-                processed_files += 1
-                
-                # Track tokens by extension
-                _, ext = os.path.splitext(file)
-                ext = ext.lower()
-                if ext not in tokens_by_extension:
-                    tokens_by_extension[ext] = {"files": 0, "tokens": 0}
-                tokens_by_extension[ext]["files"] += 1
-                tokens_by_extension[ext]["tokens"] += token_count
-                
-                # Update largest files list
-                largest_files.append((file_path, token_count))
-                largest_files.sort(key=lambda x: x[1], reverse=True)
-                largest_files = largest_files[:10]  # Keep only top 10
-            else:
-                skipped_files += 1
+        # Estimate tokens for this file
+        success, token_count, error = estimate_tokens_for_file(file_path, model, method, check_file=False)
+        if success:
+            total_tokens += token_count
+            processed_files += 1
+            
+            # Track tokens by extension
+            ext = os.path.splitext(file_path)[1].lower()
+            if ext not in tokens_by_extension:
+                tokens_by_extension[ext] = {"files": 0, "tokens": 0}
+            tokens_by_extension[ext]["files"] += 1
+            tokens_by_extension[ext]["tokens"] += token_count
+            
+            # Update largest files list
+            largest_files.append((file_path, token_count))
+            largest_files.sort(key=lambda x: x[1], reverse=True)
+            largest_files = largest_files[:10]  # Keep only top 10
+        else:
+            skipped_files += 1
     
     # Create result summary
     result = {
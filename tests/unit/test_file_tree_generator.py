@@ -35,6 +35,30 @@ def test_safe_read_file(sample_project):
     assert any("truncated" in line for line in lines), "Should include truncation message"
 
 
+def test_safe_read_file_line_length(sample_project):
+    """Test that long lines are cut at read time but still show as too long."""
+    file_path = os.path.join(sample_project, "long_line.js")
+    with open(file_path, "w") as f:
+        f.write("x" * 5000 + "\nshort\n" + "y" * 11)
+    
+    success, lines, error = file_tree_generator.safe_read_file(file_path, max_line_length=10)
+    
+    assert success is True, "Reading with a line length limit should succeed"
+    assert lines == ["x" * 11, "short", "y" * 11], "Lines should keep one character past the limit"
+    assert file_tree_generator.truncate_lines(lines, 10) == ["x" * 10 + "...", "short", "y" * 10 + "..."]
+
+
+def test_split_text_lines():
+    """Test that split text matches reading the file line by line."""
+    text = "one\ntwo\fstill two\n\nfour\n"
+
+    assert file_tree_generator.split_text_lines(text) == ["one", "two\fstill two", "", "four"]
+    assert file_tree_generator.split_text_lines(text, max_lines=4) == ["one", "two\fstill two", "", "four"]
+    assert file_tree_generator.split_text_lines(text, max_lines=2) == [
+        "one", "two\fstill two", "... (truncated after 2 lines)"]
+    assert file_tree_generator.split_text_lines("") == []
+
+
 def test_safe_write_file(output_file):
     """Test the safe_write_file function."""
     # Test writing string content
@@ -68,6 +92,22 @@ def test_safe_write_file(output_file):
     assert error is not None, "Error should be provided for failed write"
 
 
+def test_is_binary_file(sample_project):
+    """Test binary detection by null bytes and by the share of printable bytes."""
+    text_path = os.path.join(sample_project, "src", "main.py")
+    assert file_tree_generator.is_binary_file(text_path) is False, "Source file should be text"
+    
+    null_path = os.path.join(sample_project, "null.bin")
+    with open(null_path, "wb") as f:
+        f.write(b"text\x00more text")
+    assert file_tree_generator.is_binary_file(null_path) is True, "Null bytes should mean binary"
+    
+    noisy_path = os.path.join(sample_project, "noisy.bin")
+    with open(noisy_path, "wb") as f:
+        f.write(b"abcdefg\tx" + bytes(range(200, 204)))
+    assert file_tree_generator.is_binary_file(noisy_path) is True, "Under 80% printable should mean binary"
+
+
 def test_format_size():
     """Test the format_size function."""
     assert file_tree_generator.format_size(0) == "0.00 B", "0 bytes should format correctly"
@@ -77,6 +117,13 @@ def test_format_size():
     assert file_tree_generator.format_size(1024 * 1024 * 1024) == "1.00 GB", "GB should format correctly"
 
 
+def test_escape_html():
+    """Test that only lines with special characters are escaped."""
+    line = "│   ├── 📄 main.py (1.00 KB)"
+    assert file_tree_generator.escape_html(line) is line, "Plain lines should be returned as-is"
+    assert file_tree_generator.escape_html("if a < b && c > d:") == "if a &lt; b &amp;&amp; c &gt; d:"
+
+
 def test_clean_file_content():
     """Test the clean_file_content function."""
     # Test Python file with comments and empty lines
@@ -108,6 +155,23 @@ def test_clean_file_content():
     assert all(line.strip() for line in cleaned), "All lines should have content"
 
 
+def test_remove_code_comments_c_style():
+    """Test that block and line comments are removed in the order they appear."""
+    content = [
+        "int a = 1; // counter /* not a block",
+        "int b = 2; /* block",
+        "   // still inside */ int c = 3;",
+    ]
+
+    cleaned = file_tree_generator.remove_code_comments(content, ".c")
+    assert cleaned == ["int a = 1; ", "int b = 2;  int c = 3;"]
+
+    # Unterminated blocks are kept, and many of them are still handled quickly
+    content = ["<p>text</p> <!-- closed -->"] + ["<!-- open"] * 50000
+    cleaned = file_tree_generator.remove_code_comments(content, ".html")
+    assert cleaned == ["<p>text</p> "] + ["<!-- open"] * 50000
+
+
 def test_create_file_tree(sample_project, output_file):
     """Test the create_file_tree function."""
     # Basic test with all defaults
@@ -182,6 +246,30 @@ def test_create_file_tree(sample_project, output_file):
     assert "Estimated tokens:" in content, "Output should include token counts"
 
 
+def test_create_file_tree_reference_mode(sample_project, output_file):
+    """Test that reference tracking mode only shows folders with referenced files."""
+    main_file = os.path.join(sample_project, "src", "main.py")
+    
+    result = file_tree_generator.create_file_tree(
+        sample_project,
+        {".py", ".md"},
+        output_file,
+        blacklist_folders=set(),
+        blacklist_files=set(),
+        referenced_files={main_file}
+    )
+    
+    assert "successfully" in result, "Result should indicate success"
+    
+    with open(output_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    assert "main.py" in content, "Output should include the referenced file"
+    assert "[REFERENCED]" in content, "Referenced file should be marked"
+    assert "utils.py" not in content, "Output should not include unreferenced files"
+    assert "docs" not in content, "Output should not include folders without referenced files"
+
+
 @pytest.mark.parametrize("format_type", ["html", "markdown", "json"])
 def test_export_formats(sample_project, output_file, format_type):
     """Test different export formats."""
@@ -222,4 +310,161 @@ def test_export_formats(sample_project, output_file, format_type):
         with open(export_file, 'r') as f:
             json_content = f.read()
         assert '"metadata":' in json_content, "Should have metadata structure"
-        assert '"tree":' in json_content, "Should have tree structure"
\ No newline at end of file
+        assert '"tree":' in json_content, "Should have tree structure"
+
+
+def test_create_file_tree_direct_export(sample_project, output_file):
+    """Test exporting directly to a non-text format without a temporary text file."""
+    # Written into the sample project, which its fixture removes afterwards
+    export_file = os.path.join(sample_project, "tree.html")
+    result = file_tree_generator.create_file_tree(
+        sample_project,
+        {".py"},
+        export_file,
+        blacklist_folders=set(),
+        blacklist_files=set(),
+        output_format="html"
+    )
+    
+    assert "HTML format" in result, "Should report the export format"
+    assert not os.path.exists(output_file), "Should not write a text file"
+    with open(export_file, 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    assert "<!DOCTYPE html>" in html_content, "Should have HTML structure"
+    assert "main.py" in html_content, "Should include scanned files"
+
+
+def test_create_file_tree_multiple_formats(sample_project):
+    """Test exporting several formats at once next to the output file."""
+    # Written into the sample project, which its fixture removes afterwards
+    output_file = os.path.join(sample_project, "tree.txt")
+    output_base = os.path.splitext(output_file)[0]
+    result = file_tree_generator.create_file_tree(
+        sample_project,
+        {".py"},
+        output_file,
+        blacklist_folders=set(),
+        blacklist_files=set(),
+        output_format="html, markdown"
+    )
+    
+    for fmt, ext in (("HTML", ".html"), ("MARKDOWN", ".md")):
+        assert f"{fmt} format" in result, f"Should report the {fmt} export"
+        assert os.path.exists(output_base + ext), f"{fmt} file should be created"
+    assert not os.path.exists(output_file), "Should not write a text file"
+
+
+def test_create_file_tree_unknown_format(sample_project):
+    """Test that unknown output formats are reported before any file is written."""
+    output_file = os.path.join(sample_project, "tree.txt")
+    for output_format, unknown in (("pdf", "pdf"), ("txt,md", "md"), ("txt, json, docx", "docx")):
+        result = file_tree_generator.create_file_tree(
+            sample_project,
+            {".py"},
+            output_file,
+            output_format=output_format
+        )
+        assert result == f"Error: Unknown output format: {unknown}"
+    assert not os.path.exists(output_file), "Should not write any output"
+
+
+def test_export_as_json_with_metadata(output_file):
+    """Test that JSON export uses supplied metadata instead of parsing the header."""
+    import json
+    export_file = f"{os.path.splitext(output_file)[0]}.json"
+    metadata = {
+        "root": "/project",
+        "scan_date": "2024-01-01 12:00:00",
+        "extensions": [".py"],
+        "reference_tracking": True
+    }
+    file_tree_generator.export_as_json(["TREE:/other", "DATE:2000-01-01"], export_file, metadata=metadata)
+    
+    with open(export_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    os.remove(export_file)
+    assert data["metadata"] == {"root": "/project", "scan_date": "2024-01-01 12:00:00", "extensions": [".py"]}
+    assert data["reference_tracking"]["enabled"] is True
+
+
+def test_export_as_json_nested_tree(sample_project, output_file):
+    """Test that files below the root keep their place and content in the JSON tree."""
+    import json
+    file_tree_generator.create_file_tree(
+        sample_project,
+        {".py", ".md"},
+        output_file,
+        blacklist_folders=set(),
+        blacklist_files=set()
+    )
+    with open(output_file, 'r', encoding='utf-8') as f:
+        lines = f.read().split("\n")
+    
+    export_file = f"{os.path.splitext(output_file)[0]}.json"
+    file_tree_generator.export_as_json(lines, export_file)
+    with open(export_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    os.remove(export_file)
+    
+    root = data["tree"]["sample_project"]
+    assert set(root) == {"docs", "src"}, "Top-level directories should be children of the root"
+    assert set(root["src"]) == {"main.py", "utils.py"}, "Files should be placed in their directory"
+    assert root["src"]["utils.py"]["content"] == "# Utility functions\ndef add(a, b):\nreturn a + b"
+
+
+def test_read_file_cached(sample_project):
+    """Test that cached contents are reused until the file changes."""
+    file_path = os.path.join(sample_project, "src", "utils.py")
+    first = file_tree_generator.read_file_cached(file_path, os.stat(file_path))
+    second = file_tree_generator.read_file_cached(file_path, os.stat(file_path))
+    assert first == second, "Unchanged file should give the same result"
+    assert first[1] is not second[1], "Each caller should get its own list"
+    
+    with open(file_path, "a") as f:
+        f.write("\n# changed")
+    changed = file_tree_generator.read_file_cached(file_path, os.stat(file_path))
+    assert changed[1][-1] == "# changed", "A changed file should be read again"
+
+
+def test_create_file_tree_stat_error(sample_project, output_file, monkeypatch):
+    """Test that a file whose stat fails is reported on that file only."""
+    real_scandir = os.scandir
+    
+    class FailingStatEntry:
+        """DirEntry whose stat() fails for utils.py"""
+        def __init__(self, entry):
+            self.entry = entry
+        
+        def __getattr__(self, name):
+            return getattr(self.entry, name)
+        
+        def stat(self, **kwargs):
+            if self.entry.name == "utils.py":
+                raise FileNotFoundError(2, "No such file or directory", self.entry.path)
+            return self.entry.stat(**kwargs)
+    
+    class FailingStatScandir:
+        def __init__(self, path):
+            self.it = real_scandir(path)
+        
+        def __enter__(self):
+            return (FailingStatEntry(entry) for entry in self.it)
+        
+        def __exit__(self, *exc_info):
+            self.it.close()
+    
+    monkeypatch.setattr(os, "scandir", FailingStatScandir)
+    file_tree_generator.FILE_CONTENT_CACHE.clear()
+    result = file_tree_generator.create_file_tree(
+        sample_project,
+        {".py"},
+        output_file,
+        blacklist_folders=set(),
+        blacklist_files=set()
+    )
+    
+    assert "successfully" in result, "A failing file should not abort the tree"
+    with open(output_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+    assert "print('Hello, world!')" in content, "Other files should keep their content"
+    assert "utils.py" in content, "The failing file should still be listed"
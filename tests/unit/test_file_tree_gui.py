@@ -74,6 +74,7 @@ def test_log_function(gui_app):
     # Log a message
     test_message = "Test log message"
     gui_app.log(test_message)
+    gui_app.flush_log()
     
     # Get updated log content
     updated_log = gui_app.log_text.get("1.0", tk.END).strip()
@@ -119,6 +120,7 @@ def test_save_settings(gui_app, sample_project, monkeypatch):
     
     # Call save_settings with successful save
     gui_app.save_settings()
+    gui_app.flush_log()
     
     # Verify a success message was logged
     log_content = gui_app.log_text.get("1.0", tk.END)
@@ -130,6 +132,7 @@ def test_save_settings(gui_app, sample_project, monkeypatch):
     
     # Call save_settings with failed save
     gui_app.save_settings()
+    gui_app.flush_log()
     
     # Verify failure message was logged
     log_content = gui_app.log_text.get("1.0", tk.END)
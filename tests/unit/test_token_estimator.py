@@ -34,6 +34,33 @@ def test_estimate_tokens_for_empty_text():
     assert estimate == 0, "Empty text should have 0 tokens"
 
 
+def test_estimate_tokens_from_chunked_units():
+    """Test that chunked unit counts give the same estimate as the joined text."""
+    lines = ["def main():", "    print('hello world')", "", "main()"] * 50
+    text = "\n".join(lines)
+    chunks = ["\n".join(lines[:70]), "\n" + "\n".join(lines[70:])]
+    
+    for method in ("char", "word"):
+        units = sum(token_estimator.count_estimation_units(chunk, method) for chunk in chunks)
+        assert units == token_estimator.count_estimation_units(text, method)
+        assert (token_estimator.estimate_tokens_from_units(units, "gpt-4", method) ==
+                token_estimator.estimate_tokens_for_text(text, "gpt-4", method))
+
+
+def test_count_words_cache():
+    """Test that large texts are counted once and give the same result from the cache."""
+    text = "word " * token_estimator.WORD_COUNT_CACHE_MIN_LENGTH
+    token_estimator.WORD_COUNT_CACHE.clear()
+    
+    first = token_estimator.estimate_tokens_for_text(text, "gpt-4", "word")
+    assert len(token_estimator.WORD_COUNT_CACHE) == 1, "Large text should be cached"
+    assert token_estimator.estimate_tokens_for_text(text, "gpt-4", "word") == first
+    assert token_estimator.count_words(text) == token_estimator.WORD_COUNT_CACHE_MIN_LENGTH
+    
+    token_estimator.count_words("a few short words")
+    assert len(token_estimator.WORD_COUNT_CACHE) == 1, "Short texts should not be cached"
+
+
 def test_estimate_tokens_for_file(sample_project):
     """Test token estimation for a file."""
     file_path = os.path.join(sample_project, "src", "main.py")